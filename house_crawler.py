@@ -14,7 +14,7 @@ from pprint import pprint
 from src.util import load_json, write_json, extract_json
 from src.stockmarket import StockHistory
 from src.ai_tools import chatgpt
-from src.date_tools import sort_by_date
+from src.date_tools import merge_by_date
 from src.parse_house_data import parse_house_doc
 import re
 
@@ -158,6 +158,8 @@ if __name__ == "__main__":
     failures = load_json(path="./data/parsed_disclosures/failures.json")['failures']
 
     new_disclosures = []
+    # Disclosures extracted from the documents, priced once every document is parsed.
+    extracted_disclosures = []
 
     # Assign years to collect data for.
     print('Starting data collection...')
@@ -247,33 +249,36 @@ if __name__ == "__main__":
                 else:
                     disclosure["asset_type"] = None
 
+                extracted_disclosures.append(disclosure)
+
+    # Download the price history of every extracted ticker up front.
+    stock_tracker.prefetch(tickers=[disclosure["ticker"] for disclosure in extracted_disclosures if disclosure["ticker"]])
+    for disclosure in extracted_disclosures:
+        # If asset is a stock or option, assign the share price at date of transaction.
+        if disclosure["ticker"]:
+            print(f"ALERT: Getting price for '{disclosure['ticker']}'.")
+            price = stock_tracker.price(ticker=disclosure["ticker"], date_str=disclosure["transaction_date"])
+            if not price:
+                print(f"WARNING: Price retrieval failed for '{disclosure['ticker']}'.")  
+                disclosure['ticker'] = None
+        else:
+            price = None
 
-                # If asset is a stock or option, assign the share price at date of transaction.
-                if disclosure["ticker"]:
-                    print(f"ALERT: Getting price for '{disclosure['ticker']}'.")
-                    price = stock_tracker.price(ticker=disclosure["ticker"], date_str=disclosure["transaction_date"])
-                    if not price:
-                        print(f"WARNING: Price retrieval failed for '{disclosure['ticker']}'.")  
-                        disclosure['ticker'] = None
-                else:
-                    price = None
-
-                disclosure["stock_price"] = price
-                disclosure["governing_body"] = "HOUSE"
+        disclosure["stock_price"] = price
+        disclosure["governing_body"] = "HOUSE"
 
-                if disclosure['ticker']:
-                    print(f'Owner: {disclosure["first_name"]} { disclosure["last_name"]}')
-                    print(f"Ticker: {disclosure['ticker']}")
-                    print(f"Transaction: {disclosure['transaction']}")
-                    print(f"Price: ${disclosure['stock_price']}")
-                    print(f"Date: {disclosure['transaction_date']}\n")
-                    new_disclosures.append(disclosure)
+        if disclosure['ticker']:
+            print(f'Owner: {disclosure["first_name"]} { disclosure["last_name"]}')
+            print(f"Ticker: {disclosure['ticker']}")
+            print(f"Transaction: {disclosure['transaction']}")
+            print(f"Price: ${disclosure['stock_price']}")
+            print(f"Date: {disclosure['transaction_date']}\n")
+            new_disclosures.append(disclosure)
 
-    # Sort the parsed disclosures by date (earliest to latest)
+    # Merge the new disclosures into the parsed disclosures sorted by date (earliest to latest)
     print(f"\n- - PARSING COMPLETE - -")
     print(f"{len(new_disclosures)} new transactions have been extracted.")
-    parsed_disclosures.extend(new_disclosures)
-    parsed_disclosures = sort_by_date(disclosures=parsed_disclosures)
+    parsed_disclosures = merge_by_date(existing=parsed_disclosures, new=new_disclosures)
     print(f"Total Transactions: {len(parsed_disclosures)}\n")
 
     save_path = "./data/parsed_disclosures/house.json"
@@ -7,7 +7,7 @@ import re
 
 from src.util import load_json, write_json
 from src.stockmarket import StockHistory
-from src.date_tools import format_date, days_ago, sort_by_date
+from src.date_tools import format_date, days_ago, merge_by_date
 
 # Start a session to automatically handle cookies
 session = requests.Session()
@@ -260,6 +260,9 @@ if __name__ == "__main__":
     print(f"{len(disclosures)} disclosures collected.")
 
     stock_tracker = StockHistory(start_date="2012-01-01")
+    # Download the price history of every traded ticker up front.
+    tickers = [disclosure["Ticker"] for disclosure in disclosures if disclosure["Ticker"] and "--" not in disclosure["Ticker"]]
+    stock_tracker.prefetch(tickers=tickers)
     senate_trades = []
     for i, _ in enumerate(disclosures):
         print(f"Processing Disclosure: {i}/{len(disclosures)}")
@@ -360,9 +363,8 @@ if __name__ == "__main__":
         disclosures.append(record)
 
     
-    existing_disclosures.extend(disclosures)
-    # sort the data from least recent to most recent.
-    existing_disclosures = sort_by_date(disclosures=existing_disclosures)
+    # Merge the new records into the dataset, which is sorted from least recent to most recent.
+    existing_disclosures = merge_by_date(existing=existing_disclosures, new=disclosures)
     print(f"\nALERT: Successfully collected and parsed {len(disclosures)} new disclosures.")
     print(f"ALERT: The dataset now has {len(existing_disclosures)} disclosure records.\n")
 
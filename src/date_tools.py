@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta, date
+from functools import lru_cache
+import heapq
 import holidays
+import numpy as np
 
 def new_years_dates(years:list[int]):
     dates = []
@@ -65,26 +68,111 @@ def us_holidays():
     return dates
 
 
+class TradingCalendar:
+    """Precomputed day-by-day lookup tables for adjusting dates to trading days.
+
+    Every day between `first_year` and `last_year` is mapped to an array slot so that
+    holiday adjustment, session ordinals and previous / next sessions are O(1) array
+    lookups. Dates are day ordinals (`date.toordinal()`), and every method accepts a
+    single ordinal or a numpy array of ordinals.
+    """
+    def __init__(self, first_year: int = 2010, last_year: int = None):
+        if last_year is None:
+            # Leave room for dates up to a year after today (e.g. future price lookups).
+            last_year = datetime.now().year + 2
+        self.first = date(first_year, 1, 1).toordinal()
+        self.last = date(last_year, 12, 31).toordinal()
+
+        ordinals = np.arange(self.first, self.last + 1, dtype=np.int64)
+        weekdays = self.weekday_adjusted(ordinals)
+
+        # Holiday adjustment used for stock price lookups (see `StockHistory.closest_weekday`).
+        holiday_dates = np.array(sorted({day.toordinal() for day in us_holidays()}), dtype=np.int64)
+        is_holiday = np.isin(weekdays, holiday_dates)
+        on_monday = (weekdays - 1) % 7 == 0
+        self.closest = np.where(is_holiday, np.where(on_monday, weekdays - 3, weekdays - 1), weekdays)
+
+        # Trading sessions are the weekdays that the NYSE is open.
+        closures = np.array([day.toordinal() for day in holidays.NYSE(years=range(first_year, last_year + 1)).keys()], dtype=np.int64)
+        is_session = ((ordinals - 1) % 7 < 5) & ~np.isin(ordinals, closures)
+        self.sessions = ordinals[is_session]
+        session_count = np.cumsum(is_session)
+        self.previous_index = session_count - 1
+        self.next_index = session_count - is_session
+
+    def weekday_adjusted(self, ordinal):
+        """Moves Saturdays and Sundays back to the preceding Friday."""
+        weekday = (ordinal - 1) % 7
+        return ordinal - np.maximum(weekday - 4, 0)
+
+    def next_weekday(self, ordinal):
+        """Moves Saturdays and Sundays forward to the following Monday."""
+        weekday = (ordinal - 1) % 7
+        return ordinal + (7 - weekday) * (weekday >= 5)
+
+    def closest_weekday(self, ordinal):
+        """Moves weekends back to Friday and holidays (and the days around them) back a trading day."""
+        # The holiday table only spans the calendar, so outside it only weekends are adjusted.
+        in_range = (self.first <= ordinal) & (ordinal <= self.last)
+        index = np.clip(ordinal - self.first, 0, len(self.closest) - 1)
+        return np.where(in_range, self.closest[index], self.weekday_adjusted(ordinal))
+
+    def session_index(self, ordinal):
+        """Index of the most recent session on or before the date (-1 before the first session of the table)."""
+        index = np.clip(ordinal - self.first, 0, len(self.previous_index) - 1)
+        return np.where(ordinal < self.first, -1, self.previous_index[index])
+
+    def previous_session(self, ordinal):
+        """Ordinal of the most recent session on or before the date.
+
+        Before the first session or after the end of the table the NYSE closures are
+        unknown, so only weekends are skipped there.
+        """
+        index = self.session_index(ordinal)
+        outside = (index < 0) | (ordinal > self.last)
+        fallback = self.weekday_adjusted(np.where(ordinal > self.last, ordinal, np.minimum(ordinal, self.first - 1)))
+        return np.where(outside, fallback, self.sessions[np.maximum(index, 0)])
+
+    def next_session(self, ordinal):
+        """Ordinal of the first session on or after the date.
+
+        Before the start or after the last session of the table the NYSE closures are
+        unknown, so only weekends are skipped there.
+        """
+        index = self.next_index[np.clip(ordinal - self.first, 0, len(self.next_index) - 1)]
+        outside = (ordinal < self.first) | (ordinal > self.last) | (index >= len(self.sessions))
+        fallback = self.next_weekday(np.where(ordinal < self.first, ordinal, np.maximum(ordinal, self.last + 1)))
+        return np.where(outside, fallback, self.sessions[np.minimum(index, len(self.sessions) - 1)])
+
+
+@lru_cache(maxsize=None)
+def trading_calendar() -> TradingCalendar:
+    """Returns the shared trading calendar, building it on first use."""
+    return TradingCalendar()
+
+
+@lru_cache(maxsize=65536)
+def date_to_ordinal(date_str: str, date_format="%Y-%m-%d") -> int:
+    """Parses a date string to a day ordinal, caching the result for repeated dates."""
+    return datetime.strptime(date_str, date_format).toordinal()
+
+
+@lru_cache(maxsize=65536)
+def ordinal_to_date(ordinal: int, date_format="%Y-%m-%d") -> str:
+    """Formats a day ordinal as a date string, caching the result for repeated dates."""
+    return date.fromordinal(ordinal).strftime(date_format)
+
+
 def nearest_monday(date_str, date_format="%Y-%m-%d"):
-    # Parse the input date string
-    date_obj = datetime.strptime(date_str, date_format).date()
-
-    # Get the weekday (0=Monday, 6=Sunday)
-    weekday = date_obj.weekday()
-
-    # Check if the date falls on a Saturday (5) or Sunday (6)
-    if weekday == 5:  # Saturday
-        # Adjust Saturday to Friday
-        adjusted_date = date_obj - timedelta(days=1)
-    elif weekday == 6:  # Sunday
-        # Adjust Sunday to Friday
-        adjusted_date = date_obj - timedelta(days=2)
-    else:
+    # Adjust Saturday and Sunday back to Friday.
+    ordinal = date_to_ordinal(date_str, date_format)
+    adjusted = int(trading_calendar().weekday_adjusted(ordinal))
+    if adjusted == ordinal:
         # It's a weekday, return the original date
         return date_str
 
     # Return the adjusted date string in the same format
-    return adjusted_date.strftime(date_format)
+    return ordinal_to_date(adjusted, date_format)
 
 
 def get_next_day(date_str, current_format="%Y-%m-%d", target_format="%Y-%m-%d"):
@@ -116,13 +204,10 @@ def days_from_date(date_str:str, days:int, date_format="%Y-%m-%d"):
         days (int): The number of days from the date string 
         date_format (str, optional): The input and output date format. Defaults to "%Y-%m-%d".
     """
-    input_date = datetime.strptime(date_str, date_format)
-    output_date = input_date + timedelta(days=days)
-
-    output_datestr = output_date.strftime(date_format)
+    output_ordinal = date_to_ordinal(date_str, date_format) + days
     # Ensure the output date is a weekday
-    output_datestr = nearest_monday(date_str=output_datestr)
-    return output_datestr
+    output_ordinal = int(trading_calendar().weekday_adjusted(output_ordinal))
+    return ordinal_to_date(output_ordinal, date_format)
 
 
 
@@ -151,10 +236,82 @@ def days_ago(date_str, date_format="%m/%d/%Y"):
     delta = today_date - past_date
     return delta.days
 
+def days_ago_ordinal(ordinal: int) -> int:
+    """Returns the number of days between a day ordinal and today (fast path of `days_ago`)."""
+    return datetime.now().toordinal() - ordinal
+
+
+def days_from_ordinal(ordinal: int, days: int) -> int:
+    """Returns the day ordinal {days} days from {ordinal}, moved off weekends (fast path of `days_from_date`)."""
+    return int(trading_calendar().weekday_adjusted(ordinal + days))
+
+
+def parse_ordinal(date_str: str, date_format="%Y-%m-%d"):
+    """Parses a date string to a day ordinal, returning None for missing or malformed dates."""
+    if not date_str:
+        return None
+    try:
+        return date_to_ordinal(date_str, date_format)
+    except (ValueError, TypeError):
+        return None
+
+
+def add_date_ordinals(disclosures: list[dict]) -> list[dict]:
+    """Parses the dates of disclosure records once and stores them as integer day ordinals.
+
+    Adds 'transaction_ordinal', 'notification_ordinal' and 'option_exp_ordinal' fields
+    (None when the date is missing) so later date arithmetic is integer math.
+
+    Args:
+        disclosures (list[dict]): List of disclosure dictionary records
+
+    Returns:
+        list[dict]: The same records with the ordinal fields added.
+    """
+    for disclosure in disclosures:
+        if "transaction_ordinal" in disclosure:
+            continue
+        disclosure["transaction_ordinal"] = parse_ordinal(disclosure.get("transaction_date"))
+        disclosure["notification_ordinal"] = parse_ordinal(disclosure.get("notification_date"))
+        disclosure["option_exp_ordinal"] = parse_ordinal(disclosure.get("option_exp_date"))
+    return disclosures
+
+
+def transaction_ordinal(disclosure: dict) -> int:
+    """Returns the transaction day ordinal of a disclosure, parsing the date if it was not precomputed."""
+    ordinal = disclosure.get("transaction_ordinal")
+    if ordinal is None:
+        ordinal = date_to_ordinal(disclosure["transaction_date"])
+    return ordinal
+
+
 def sort_by_date(disclosures: list[dict]):
     """Sorts a list of disclosures by the transaction date from least to most recent
 
     Args:
         disclosures (list[dict]): List of disclosure dictionary records
     """
-    return sorted(disclosures, key=lambda x: datetime.strptime(x["transaction_date"], "%Y-%m-%d"))
+    return sorted(disclosures, key=transaction_ordinal)
+
+
+
+def merge_by_date(existing: list[dict], new: list[dict]) -> list[dict]:
+    """Merges a batch of new disclosures into a list that is already sorted by transaction date.
+
+    Only the new batch is sorted; it is then merged into the existing records in a single
+    linear pass. Records with the same date keep their order, with existing records first,
+    which matches sorting the combined list with `sort_by_date`.
+
+    Args:
+        existing (list[dict]): Disclosure records sorted from least to most recent
+        new (list[dict]): New disclosure records in any order
+
+    Returns:
+        list[dict]: The combined disclosure records sorted from least to most recent
+    """
+    ordinals = [transaction_ordinal(disclosure) for disclosure in existing]
+    if any(ordinals[i] > ordinals[i + 1] for i in range(len(ordinals) - 1)):
+        # Fall back to a full sort if the existing records are out of order.
+        return sort_by_date(disclosures=existing + new)
+
+    return list(heapq.merge(existing, sort_by_date(disclosures=new), key=transaction_ordinal))
\ No newline at end of file
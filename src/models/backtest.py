@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .models import clean_input, create_model
+
+# Dataset shared with the worker processes, set once per process by `init_worker`.
+WORKER_DATA = {}
+
+
+def load_dataset(path: str = "./data/training_data/stock_metrics.csv"):
+    """Loads the training data once, sorted by date, with the model features prepared.
+
+    Args:
+        path (str, optional): Path of the training data. Defaults to "./data/training_data/stock_metrics.csv".
+
+    Returns:
+        tuple[pd.DataFrame, np.ndarray, np.ndarray]: The dataset, its feature matrix and its day ordinals.
+    """
+    df = pd.read_csv(path)
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values(by='date', kind='stable').reset_index(drop=True)
+    features = clean_input(records=df.copy())
+    ordinals = np.array([date.toordinal() for date in df['date']], dtype=np.int64)
+    return df, features, ordinals
+
+
+def window_start_dates(first_year: int = 2018, last_year: int = 2023, last_month: int = 3, days=range(1, 28, 5)) -> list[datetime]:
+    """Start dates of the test windows, by default the ones of the xg_boost.ipynb experiment."""
+    dates = []
+    for year in range(first_year, last_year + 1):
+        stop_month = last_month if year == last_year else 12
+        for month in range(1, stop_month + 1):
+            for day in days:
+                dates.append(datetime(year, month, day))
+    return dates
+
+
+def split_indices(ordinals: np.ndarray, start_dates: list[datetime], window_days: int = 120) -> np.ndarray:
+    """Precomputes the row ranges of every window of a date-sorted dataset.
+
+    The rows before `train_end` are dated before the window start, and the test rows are
+    `test_start:test_end`, dated from the start to {window_days} days after it (inclusive).
+
+    Returns:
+        np.ndarray: One (train_end, test_start, test_end) row per window.
+    """
+    starts = np.array([date.toordinal() for date in start_dates], dtype=np.int64)
+    test_start = np.searchsorted(ordinals, starts, side="left")
+    test_end = np.searchsorted(ordinals, starts + window_days, side="right")
+    return np.stack([test_start, test_start, test_end], axis=1)
+
+
+def init_worker(features: pd.DataFrame, labels: np.ndarray, scores: np.ndarray):
+    WORKER_DATA["features"] = features
+    WORKER_DATA["labels"] = labels
+    WORKER_DATA["scores"] = scores
+
+
+def top_gains(ranking: np.ndarray, actual: np.ndarray, top: int) -> list:
+    """Actual growth of the {top} highest ranked rows (stable, so ties keep the dataset order)."""
+    order = np.argsort(-ranking, kind="stable")
+    return actual[order[:top]].tolist()
+
+
+def evaluate_window(split, model: str = "xgboost", top: int = 5, include_future: bool = False) -> dict:
+    """Trains a model for one window and ranks its test rows by prediction and by score.
+
+    Args:
+        split (tuple[int, int, int]): The (train_end, test_start, test_end) rows of the window.
+        model (str, optional): Model passed to `create_model`. Defaults to "xgboost".
+        top (int, optional): Number of top ranked rows to evaluate. Defaults to 5.
+        include_future (bool, optional): Also train on the rows after the test window. Defaults to False.
+
+    Returns:
+        dict: The top gains of the model and of the score, and the average growth of all test rows.
+    """
+    features, labels, scores = WORKER_DATA["features"], WORKER_DATA["labels"], WORKER_DATA["scores"]
+    train_end, test_start, test_end = (int(value) for value in split)
+    train_rows = np.arange(train_end)
+    if include_future:
+        train_rows = np.concatenate([train_rows, np.arange(test_end, len(labels))])
+
+    regressor = create_model(model=model)
+    regressor.fit(features.iloc[train_rows], labels[train_rows])
+    predictions = regressor.predict(features.iloc[test_start:test_end])
+
+    actual = labels[test_start:test_end]
+    return {
+        "test_size": len(actual),
+        "average_growth": float(actual.mean()),
+        "model": top_gains(np.asarray(predictions, dtype=np.float64), actual, top),
+        "score": top_gains(scores[test_start:test_end], actual, top),
+    }
+
+
+def summarize(windows: list[dict], years: list[int], method: str) -> dict:
+    """Computes the yearly "benefit" and the overall "gain" of the xg_boost.ipynb experiment.
+
+    The benefit of a year is the average growth of the top ranked rows over the year's
+    windows minus the average growth of all test rows, in percent. The notebook compared
+    against the last window of each year only, here every window of the year is averaged.
+    """
+    yearly = {}
+    gains = []
+    for year in sorted(set(years)):
+        year_windows = [window for window, window_year in zip(windows, years) if window_year == year]
+        top_averages = [np.mean(window[method]) for window in year_windows]
+        all_averages = [window["average_growth"] for window in year_windows]
+        avg = sum(top_averages) / len(top_averages)
+        avg_yearly = sum(all_averages) / len(all_averages)
+        yearly[year] = {
+            "windows": len(year_windows),
+            "test_size": int(sum(window["test_size"] for window in year_windows) / len(year_windows)),
+            "average_actual": round((avg - 1) * 100, 2),
+            "average_yearly": round((avg_yearly - 1) * 100, 2),
+            "benefit": round((avg - avg_yearly) * 100, 2),
+        }
+        for window in year_windows:
+            gains.extend(window[method])
+
+    benefits = [result["benefit"] for result in yearly.values()]
+    return {
+        "years": yearly,
+        "average_benefit": sum(benefits) / len(benefits) if benefits else None,
+        "average_gain": sum(gains) / len(gains) if gains else None,
+    }
+
+
+def walk_forward(path: str = "./data/training_data/stock_metrics.csv", start_dates: list[datetime] = None, window_days: int = 120, top: int = 5, model: str = "xgboost", include_future: bool = False, workers: int = 4, verbose: bool = True) -> dict:
+    """Walk-forward evaluation of the model and of the `calculate_score` baseline.
+
+    For every window start, a model is trained on the rows dated before the window and
+    the window's rows (the next {window_days} days) are ranked by the model's predicted
+    growth and by their score. The actual growth of the {top} highest ranked rows is
+    compared with the average growth of all rows in the window. The dataset is loaded and
+    preprocessed once and the windows are trained in parallel on a process pool.
+
+    Args:
+        path (str, optional): Path of the training data. Defaults to "./data/training_data/stock_metrics.csv".
+        start_dates (list[datetime], optional): Window start dates. Defaults to None (`window_start_dates()`).
+        window_days (int, optional): Length of the test windows in days. Defaults to 120.
+        top (int, optional): Number of top ranked rows per window. Defaults to 5.
+        model (str, optional): Model passed to `create_model`. Defaults to "xgboost".
+        include_future (bool, optional): Also train on the rows after each test window. Defaults to False.
+        workers (int, optional): Number of worker processes. Defaults to 4.
+        verbose (bool, optional): Print the results. Defaults to True.
+
+    Returns:
+        dict: The yearly and overall "benefit" and "gain" of the 'model' and the 'score' rankings.
+    """
+    df, features, ordinals = load_dataset(path=path)
+    labels = df['price_change'].to_numpy(dtype=np.float64)
+    scores = df['score'].to_numpy(dtype=np.float64)
+
+    start_dates = start_dates if start_dates is not None else window_start_dates()
+    splits = split_indices(ordinals=ordinals, start_dates=start_dates, window_days=window_days)
+    # Windows without training or test rows cannot be evaluated.
+    usable = [i for i, (train_end, test_start, test_end) in enumerate(splits) if train_end > 0 and test_end > test_start]
+    years = [start_dates[i].year for i in usable]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(features, labels, scores)) as executor:
+            futures = [executor.submit(evaluate_window, splits[i], model, top, include_future) for i in usable]
+            windows = [future.result() for future in futures]
+    else:
+        init_worker(features, labels, scores)
+        windows = [evaluate_window(splits[i], model=model, top=top, include_future=include_future) for i in usable]
+
+    results = {method: summarize(windows=windows, years=years, method=method) for method in ["model", "score"]}
+    if verbose:
+        for method, label in [("model", f"Model ({model})"), ("score", "Score")]:
+            print(f"{label} Top-{top}{' (with future)' if include_future and method == 'model' else ''}:")
+            for year, result in results[method]["years"].items():
+                print(f"    {year}: Actual {result['average_actual']}%, Yearly {result['average_yearly']}%, Benefit {result['benefit']}% ({result['test_size']} samples)")
+            print(f"    - Average Benefit: {results[method]['average_benefit']}")
+            print(f"    - Average Gain: {results[method]['average_gain']}\n")
+    return results
@@ -23,6 +23,20 @@ def clean_input(records:list[dict]):
     return x
 
 
+def create_model(model="xgboost"):
+    """Creates an untrained regressor for the price change of the stock metrics.
+
+    Args:
+        model (str, optional): 'xgboost' (the settings of the xg_boost.ipynb experiment) or 'gradient_boost'. Defaults to "xgboost".
+    """
+    if model == "xgboost":
+        import xgboost as xgb
+        return xgb.XGBRegressor(objective='reg:squarederror', colsample_bytree=0.3, learning_rate=0.1, max_depth=5, alpha=10, n_estimators=100, random_state=42)
+    if model == "gradient_boost":
+        return GradientBoostingRegressor(random_state=42)
+    raise ValueError(f"Unknown model '{model}'. Options: ['xgboost', 'gradient_boost']")
+
+
 def model_predict(records:list[dict], model="gradient_boost", clean=True):
     if model == "gradient_boost":
         model = joblib.load(f'{os.path.dirname(__file__)}/pretrained_models/gradient_boosting_regressor.joblib')
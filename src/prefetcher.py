@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import logger
+from .stockmarket import StockHistory
+
+
+class BackgroundPrefetch:
+    """Downloads the price history of tickers on a background thread.
+
+    The analyses first prepare the disclosures (filtering, grouping, columnar tables),
+    which does not need any prices. Starting the download before that work and waiting
+    for it right before the first price lookup overlaps the network I/O with the CPU
+    work. The StockHistory must not be used by other threads until `wait` returns.
+    """
+    def __init__(self, stock_history: StockHistory, tickers: list):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-prefetch")
+        self.future = self.executor.submit(stock_history.prefetch, tickers)
+
+    def wait(self) -> int:
+        """Waits until the prices are loaded.
+
+        Returns:
+            int: Number of tickers that have price history, or 0 if the prefetch failed.
+        """
+        try:
+            return self.future.result()
+        except Exception as e:
+            # The analysis falls back to loading tickers on demand.
+            logger.warning(f"WARNING: Background price prefetch failed: {e}")
+            return 0
+        finally:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,471 @@
+import os
+import json
+import time
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+# datetime64[D] counts days from 1970-01-01, date.toordinal() counts from 0001-01-01.
+EPOCH_ORDINAL = 719163
+
+
+class TickerPrices:
+    """Columnar price history for a single ticker.
+
+    Each trading session is stored as a row across contiguous arrays, keyed by the
+    session's day ordinal (`date.toordinal()`) and sorted from least to most recent.
+    """
+    __slots__ = ("sessions", "close", "adj_close", "volume")
+
+    def __init__(self, sessions, close, adj_close=None, volume=None):
+        self.sessions = np.asarray(sessions, dtype=np.int32)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.adj_close = self.close if adj_close is None else np.asarray(adj_close, dtype=np.float64)
+        # A read-only broadcast view keeps a missing volume column from allocating memory.
+        self.volume = np.broadcast_to(np.float64(0), self.sessions.shape) if volume is None else np.asarray(volume, dtype=np.float64)
+
+    @classmethod
+    def from_frame(cls, hist):
+        """Builds the columnar history from a yfinance history dataframe.
+
+        Args:
+            hist (pd.DataFrame): Price history with a 'Date' column (or index) and 'Close' prices.
+
+        Returns:
+            TickerPrices: The sorted, de-duplicated price history.
+        """
+        if "Date" not in hist.columns:
+            hist = hist.reset_index()
+
+        dates = hist["Date"]
+        if getattr(dates.dt, "tz", None) is not None:
+            # Keep the exchange's local calendar date.
+            dates = dates.dt.tz_localize(None)
+        sessions = dates.values.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+        close = hist["Close"].to_numpy(dtype=np.float64)
+        adj_close = hist["Adj Close"].to_numpy(dtype=np.float64) if "Adj Close" in hist.columns else None
+        volume = hist["Volume"].to_numpy(dtype=np.float64) if "Volume" in hist.columns else None
+        return cls.from_arrays(sessions=sessions, close=close, adj_close=adj_close, volume=volume)
+
+    @classmethod
+    def from_arrays(cls, sessions, close, adj_close=None, volume=None):
+        """Builds the history from unsorted arrays, keeping the last record of any duplicated session."""
+        sessions = np.asarray(sessions, dtype=np.int64)
+        order = np.argsort(sessions, kind="stable")
+        sorted_sessions = sessions[order]
+        keep = np.ones(len(sorted_sessions), dtype=bool)
+        keep[:-1] = sorted_sessions[1:] != sorted_sessions[:-1]
+        index = order[keep]
+
+        return cls(
+            sessions=sorted_sessions[keep],
+            close=np.asarray(close, dtype=np.float64)[index],
+            adj_close=None if adj_close is None else np.asarray(adj_close, dtype=np.float64)[index],
+            volume=None if volume is None else np.asarray(volume, dtype=np.float64)[index],
+        )
+
+    def merge(self, other):
+        """Combines two histories of the same ticker, preferring `other` on overlapping sessions."""
+        return TickerPrices.from_arrays(
+            sessions=np.concatenate([self.sessions, other.sessions]),
+            close=np.concatenate([self.close, other.close]),
+            adj_close=np.concatenate([self.adj_close, other.adj_close]),
+            volume=np.concatenate([self.volume, other.volume]),
+        )
+
+    def __len__(self):
+        return len(self.sessions)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.sessions, self.close]
+        if self.adj_close is not self.close:
+            arrays.append(self.adj_close)
+        if self.volume.strides != (0,):
+            # Broadcast views of a missing volume column take no memory.
+            arrays.append(self.volume)
+        return sum(array.nbytes for array in arrays)
+
+
+class PriceCache:
+    """Persists ticker price histories on disk, one compressed .npz file per ticker.
+
+    Alongside the price arrays, each file records the date range (as day ordinals,
+    end exclusive) that has been requested from the provider so only the missing
+    head or tail needs to be downloaded on later runs.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, ticker: str) -> str:
+        safe_ticker = "".join(char if char.isalnum() or char in "-_." else "_" for char in ticker)
+        return os.path.join(self.directory, f"{safe_ticker}.npz")
+
+    def load(self, ticker: str):
+        """Loads a cached ticker history.
+
+        Args:
+            ticker (str): The ticker symbol.
+
+        Returns:
+            tuple: (TickerPrices, covered_start, covered_end) or None if the ticker is not cached.
+        """
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                close = data["close"]
+                adj_close = data["adj_close"]
+                prices = TickerPrices(
+                    sessions=data["sessions"],
+                    close=close,
+                    # Share the close column when the provider already adjusts prices.
+                    adj_close=None if np.array_equal(adj_close, close, equal_nan=True) else adj_close,
+                    volume=data["volume"],
+                )
+                covered_start, covered_end = (int(value) for value in data["covered"])
+        except Exception:
+            # Treat unreadable files as a cache miss so they are downloaded again.
+            return None
+        return prices, covered_start, covered_end
+
+    def save(self, ticker: str, prices: TickerPrices, covered_start: int, covered_end: int):
+        path = self.path(ticker)
+        temp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            temp_path,
+            sessions=prices.sessions,
+            close=prices.close,
+            adj_close=prices.adj_close,
+            volume=prices.volume,
+            covered=np.array([covered_start, covered_end], dtype=np.int64),
+        )
+        # Replace atomically so concurrent readers never see a partial file.
+        os.replace(temp_path, path)
+
+
+class NegativeCache:
+    """Remembers tickers and (ticker, date) lookups that failed to resolve.
+
+    Failures are appended to a JSON lines file so they survive across runs, and
+    expire after `ttl_days` so that a ticker is eventually retried. Failed date
+    lookups are kept per ticker as {ticker: {date: time}}.
+    """
+    def __init__(self, path: str = None, ttl_days: float = 30):
+        self.path = path
+        self.ttl = ttl_days * 24 * 60 * 60
+        self.tickers = {}
+        # Tickers that failed to download in this run, which may work again on the next.
+        self.failed = set()
+        self.dates = {}
+        self.counters = {"ticker_hits": 0, "date_hits": 0, "tickers_added": 0, "dates_added": 0}
+        self.load()
+
+    def __contains__(self, ticker: str) -> bool:
+        return self.has_ticker(ticker)
+
+    def has_ticker(self, ticker: str) -> bool:
+        if ticker in self.failed or self.active(self.tickers, ticker):
+            self.counters["ticker_hits"] += 1
+            return True
+        return False
+
+    def has_date(self, ticker: str, date_str: str) -> bool:
+        if ticker in self.dates and self.active(self.dates[ticker], date_str):
+            self.counters["date_hits"] += 1
+            return True
+        return False
+
+    def add(self, ticker: str, persist: bool = True):
+        """Flags a ticker that has no price history.
+
+        Args:
+            ticker (str): The ticker symbol.
+            persist (bool, optional): Remember the ticker across runs until the TTL expires. Use False
+                for failures that may be transient (e.g. network errors) to only skip it in this run. Defaults to True.
+        """
+        if ticker in self.failed or self.active(self.tickers, ticker):
+            return
+        self.counters["tickers_added"] += 1
+        if not persist:
+            self.failed.add(ticker)
+            return
+        self.tickers[ticker] = time.time()
+        self.append({"ticker": ticker, "time": self.tickers[ticker]})
+
+    def add_date(self, ticker: str, date_str: str):
+        """Flags a date that could not be resolved to a trading session of a ticker."""
+        dates = self.dates.setdefault(ticker, {})
+        if self.active(dates, date_str):
+            return
+        dates[date_str] = time.time()
+        self.counters["dates_added"] += 1
+        self.append({"ticker": ticker, "date": date_str, "time": dates[date_str]})
+
+    def discard_dates(self, ticker: str):
+        """Forgets the failed date lookups of a ticker, e.g. once more of its price history is known."""
+        if self.dates.pop(ticker, None):
+            self.save()
+
+    def active(self, entries: dict, key) -> bool:
+        failed_at = entries.get(key)
+        if failed_at is None:
+            return False
+        if time.time() - failed_at > self.ttl:
+            del entries[key]
+            return False
+        return True
+
+    def append(self, entry: dict):
+        if self.path is None:
+            return
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        expired = 0
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if time.time() - entry["time"] > self.ttl:
+                    expired += 1
+                    continue
+                if "date" in entry:
+                    self.dates.setdefault(entry["ticker"], {})[entry["date"]] = entry["time"]
+                else:
+                    self.tickers[entry["ticker"]] = entry["time"]
+
+        if expired:
+            # Compact the log so expired entries are not read again.
+            self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            for ticker, failed_at in self.tickers.items():
+                file.write(json.dumps({"ticker": ticker, "time": failed_at}) + "\n")
+            for ticker, dates in self.dates.items():
+                for date_str, failed_at in dates.items():
+                    file.write(json.dumps({"ticker": ticker, "date": date_str, "time": failed_at}) + "\n")
+        os.replace(temp_path, self.path)
+
+
+class PriceStore:
+    """Maps tickers to their columnar price histories.
+
+    With a `max_bytes` budget the store keeps tickers in least-recently-used order and
+    evicts whole tickers once the budget is exceeded. Evicted tickers are reloaded by
+    StockHistory from the persistent price cache on their next lookup, and `on_evict`
+    is called with each evicted ticker so derived data can be dropped with it.
+    """
+    def __init__(self, max_bytes: int = None, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.tickers = OrderedDict()
+        self.total_bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __contains__(self, ticker):
+        if ticker in self.tickers:
+            self.counters["hits"] += 1
+            return True
+        self.counters["misses"] += 1
+        return False
+
+    def __getitem__(self, ticker) -> TickerPrices:
+        prices = self.tickers[ticker]
+        if self.max_bytes is not None:
+            self.tickers.move_to_end(ticker)
+        return prices
+
+    def __setitem__(self, ticker, prices: TickerPrices):
+        if ticker in self.tickers:
+            self.total_bytes -= self.tickers.pop(ticker).nbytes
+        self.tickers[ticker] = prices
+        self.total_bytes += prices.nbytes
+        self.evict()
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def keys(self):
+        return self.tickers.keys()
+
+    def evict(self):
+        """Drops least recently used tickers until the store fits its memory budget."""
+        if self.max_bytes is None:
+            return
+        # Never evict the most recently stored ticker, even if it exceeds the budget by itself.
+        while self.total_bytes > self.max_bytes and len(self.tickers) > 1:
+            ticker, prices = self.tickers.popitem(last=False)
+            self.total_bytes -= prices.nbytes
+            self.counters["evictions"] += 1
+            if self.on_evict is not None:
+                self.on_evict(ticker)
+
+    @property
+    def nbytes(self) -> int:
+        return self.total_bytes
+
+
+def round_values(values, digits: int = 2):
+    """Rounds an array exactly like Python's `round`, which np.round does not match on ties."""
+    return np.array([round(value, digits) for value in np.asarray(values, dtype=np.float64).tolist()], dtype=np.float64)
+
+
+def nearest_sessions(sessions, targets, tolerance: int = 14):
+    """Vectorized nearest-session search for many target dates at once.
+
+    Ties between the previous and next session resolve to the previous session, and
+    targets further than `tolerance` days from every session are flagged with -1.
+
+    Args:
+        sessions (np.ndarray): Sorted session day ordinals for a ticker.
+        targets (np.ndarray): Day ordinals of the requested dates.
+        tolerance (int, optional): Maximum distance in days to a session. Defaults to 14.
+
+    Returns:
+        np.ndarray: Index of the nearest session for each target, or -1 if none is in range.
+    """
+    targets = np.asarray(targets, dtype=np.int64)
+    count = len(sessions)
+    if count == 0:
+        return np.full(len(targets), -1, dtype=np.int64)
+
+    pos = np.searchsorted(sessions, targets, side="left")
+    before = np.clip(pos - 1, 0, count - 1)
+    after = np.clip(pos, 0, count - 1)
+    use_after = (pos < count) & ((pos == 0) | (sessions[after] - targets < targets - sessions[before]))
+    nearest = np.where(use_after, after, before)
+
+    in_range = np.abs(sessions[nearest].astype(np.int64) - targets) <= tolerance
+    return np.where(in_range, nearest, -1)
+
+
+class PriceMatrix:
+    """Read-only ticker x session matrix of closing prices shared between processes.
+
+    The matrix is saved as .npy files in a directory and opened with memory mapping, so
+    any number of worker processes can read the same copy of the price history without
+    loading or pickling it. Missing prices are NaN. A ticker's history is exposed as
+    TickerPrices views over its row between its first and last traded session, with
+    any sessions it did not trade in between left out so lookups match a PriceStore.
+    """
+    def __init__(self, tickers: list, sessions, close, bounds, path: str = None):
+        self.path = path
+        self.tickers = list(tickers)
+        self.rows = {ticker: row for row, ticker in enumerate(self.tickers)}
+        self.sessions = sessions
+        self.close = close
+        self.bounds = bounds
+
+    @classmethod
+    def build(cls, store: PriceStore, path: str, tickers: list = None, load=None):
+        """Writes the histories of a price store to a matrix directory and opens it.
+
+        Args:
+            store (PriceStore): The price histories to export.
+            path (str): Directory for the matrix files (replaced if it exists).
+            tickers (list[str], optional): Tickers to export. Defaults to None (every ticker in the store).
+            load (callable, optional): Returns the TickerPrices of a ticker (or None if it has no history),
+                for tickers that may not be in the store, e.g. after an eviction. Defaults to None (`store[ticker]`).
+
+        Returns:
+            PriceMatrix: The memory-mapped matrix.
+        """
+        if load is None:
+            load = store.__getitem__
+        temp_path = f"{path.rstrip(os.sep)}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        # Every ticker is loaded once and its rows are staged on disk, only the sessions are read back into memory.
+        sessions_path = os.path.join(temp_path, "rows_sessions.bin")
+        close_path = os.path.join(temp_path, "rows_close.bin")
+        requested = sorted(store.keys() if tickers is None else tickers)
+        tickers = []
+        offsets = [0]
+        with open(sessions_path, "wb") as sessions_file, open(close_path, "wb") as close_file:
+            for ticker in requested:
+                prices = load(ticker)
+                if prices is None:
+                    continue
+                sessions_file.write(np.ascontiguousarray(prices.sessions, dtype=np.int32).tobytes())
+                close_file.write(np.ascontiguousarray(prices.close, dtype=np.float64).tobytes())
+                tickers.append(ticker)
+                offsets.append(offsets[-1] + len(prices.sessions))
+
+        row_sessions = np.fromfile(sessions_path, dtype=np.int32)
+        row_close = np.memmap(close_path, dtype=np.float64, mode="r") if offsets[-1] else np.array([], dtype=np.float64)
+        sessions = np.unique(row_sessions).astype(np.int32)
+
+        close = np.lib.format.open_memmap(os.path.join(temp_path, "close.npy"), mode="w+", dtype=np.float64, shape=(len(tickers), len(sessions)))
+        bounds = np.zeros((len(tickers), 2), dtype=np.int64)
+        for row in range(len(tickers)):
+            start, end = offsets[row], offsets[row + 1]
+            columns = np.searchsorted(sessions, row_sessions[start:end])
+            close[row, :] = np.nan
+            close[row, columns] = row_close[start:end]
+            if len(columns):
+                bounds[row] = (columns[0], columns[-1] + 1)
+        close.flush()
+        del close, row_close, row_sessions
+        os.remove(sessions_path)
+        os.remove(close_path)
+
+        np.save(os.path.join(temp_path, "sessions.npy"), sessions)
+        np.save(os.path.join(temp_path, "bounds.npy"), bounds)
+        with open(os.path.join(temp_path, "tickers.json"), "w", encoding="utf-8") as file:
+            json.dump(tickers, file)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp_path, path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str):
+        """Opens a matrix directory written by `build` without copying it into memory."""
+        with open(os.path.join(path, "tickers.json"), "r", encoding="utf-8") as file:
+            tickers = json.load(file)
+        return cls(
+            tickers=tickers,
+            sessions=np.load(os.path.join(path, "sessions.npy"), mmap_mode="r"),
+            close=np.load(os.path.join(path, "close.npy"), mmap_mode="r"),
+            bounds=np.load(os.path.join(path, "bounds.npy")),
+            path=path,
+        )
+
+    def __contains__(self, ticker):
+        return ticker in self.rows
+
+    def __getitem__(self, ticker) -> TickerPrices:
+        row = self.rows[ticker]
+        first, last = self.bounds[row]
+        sessions, close = self.sessions[first:last], self.close[row, first:last]
+        traded = ~np.isnan(close)
+        if not traded.all():
+            # Only copy the rare rows with gaps, the others stay views of the shared matrix.
+            sessions, close = sessions[traded], close[traded]
+        return TickerPrices(sessions=sessions, close=close)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def keys(self):
+        return self.rows.keys()
+
+    @property
+    def nbytes(self) -> int:
+        return self.close.nbytes + self.sessions.nbytes
@@ -0,0 +1,136 @@
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFPricesMissingError
+
+
+class PriceProvider:
+    """Base class for the sources of daily price history used by StockHistory.
+
+    Providers return dataframes with a 'Date' column and at least a 'Close' column.
+    An empty dataframe is a definite answer that the ticker has no data (e.g. it is
+    delisted), while failed requests (network errors, rate limits) raise.
+    """
+    # Name of the provider's folder in the persistent price cache (None disables the cache).
+    cache_name = None
+
+    def history(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """Returns the daily price history of a ticker between two dates (end exclusive)."""
+        raise NotImplementedError
+
+    def download(self, tickers: list, start_date: str, end_date: str, timeout: int = 30) -> dict:
+        """Returns the daily price history of several tickers, keyed by ticker (tickers that failed to download are left out)."""
+        histories = {}
+        for ticker in tickers:
+            try:
+                histories[ticker] = self.history(ticker, start_date, end_date)
+            except Exception:
+                # The caller retries the tickers that are left out.
+                continue
+        return histories
+
+
+class YFinanceProvider(PriceProvider):
+    """Downloads price history from Yahoo Finance."""
+    cache_name = "yfinance"
+    # Batches use the per-ticker `download` of the base class: yf.download collects its
+    # results in module globals that every call resets, so concurrent batches would wipe
+    # or mix each other's results, while Ticker.history is safe to call from several threads.
+
+    def history(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        # yfinance returns an empty frame for failed requests too, so ask it to raise instead.
+        try:
+            hist = yf.Ticker(ticker).history(start=start_date, end=end_date, raise_errors=True)
+        except YFPricesMissingError:
+            # Yahoo's chart response had no prices for the ticker. Other errors, including a
+            # missing timezone (which is also raised when the timezone lookup fails on the
+            # network), are failed downloads.
+            return pd.DataFrame()
+        return hist.reset_index()
+
+
+class LocalDirectoryProvider(PriceProvider):
+    """Reads price history from a directory of per-ticker CSV or Parquet files.
+
+    Files are named after the ticker (e.g. 'AAPL.csv' or 'AAPL.parquet') and contain a
+    'Date' column plus 'Close' and optionally 'Adj Close' and 'Volume' columns.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def history(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        parquet_path = os.path.join(self.directory, f"{ticker}.parquet")
+        csv_path = os.path.join(self.directory, f"{ticker}.csv")
+        if os.path.exists(parquet_path):
+            hist = pd.read_parquet(parquet_path)
+        elif os.path.exists(csv_path):
+            hist = pd.read_csv(csv_path)
+        else:
+            return pd.DataFrame()
+
+        if "Date" not in hist.columns:
+            hist = hist.reset_index()
+        hist["Date"] = pd.to_datetime(hist["Date"])
+        if hist["Date"].dt.tz is not None:
+            hist["Date"] = hist["Date"].dt.tz_localize(None)
+        in_range = (hist["Date"] >= pd.Timestamp(start_date)) & (hist["Date"] < pd.Timestamp(end_date))
+        return hist[in_range].reset_index(drop=True)
+
+
+class SyntheticProvider(PriceProvider):
+    """Generates deterministic random-walk prices without any network access.
+
+    Each ticker gets its own geometric random walk over business days, seeded from the
+    provider seed and the ticker symbol, so a ticker's prices do not depend on the
+    requested range or on which other tickers were requested.
+    """
+    origin = "2000-01-03"
+
+    def __init__(self, seed: int = 42, invalid_tickers: list = None, drift: float = 0.0003, volatility: float = 0.02):
+        self.seed = seed
+        self.invalid_tickers = set(invalid_tickers or [])
+        self.drift = drift
+        self.volatility = volatility
+        self.cache_name = f"synthetic-{seed}"
+
+    def history(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        if ticker in self.invalid_tickers:
+            return pd.DataFrame()
+
+        end = pd.Timestamp(end_date) - pd.Timedelta(days=1)
+        dates = pd.bdate_range(self.origin, max(end, pd.Timestamp(self.origin)))
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode("utf-8"))])
+        start_price = rng.uniform(10, 500)
+        returns = rng.normal(self.drift, self.volatility, size=len(dates))
+        close = start_price * np.exp(np.cumsum(returns))
+        volume = rng.integers(100_000, 10_000_000, size=len(dates)).astype(np.float64)
+
+        hist = pd.DataFrame({"Date": dates, "Close": close, "Volume": volume})
+        in_range = (hist["Date"] >= pd.Timestamp(start_date)) & (hist["Date"] <= end)
+        return hist[in_range].reset_index(drop=True)
+
+
+def get_provider(provider="yfinance", **kwargs) -> PriceProvider:
+    """Resolves a provider name to a provider instance.
+
+    Args:
+        provider (str | PriceProvider, optional): 'yfinance', 'local', 'synthetic' or a provider instance. Defaults to "yfinance".
+        **kwargs: Arguments for the provider (e.g. `directory` for 'local', `seed` for 'synthetic').
+
+    Returns:
+        PriceProvider: The provider instance.
+    """
+    if isinstance(provider, PriceProvider):
+        return provider
+
+    providers = {
+        "yfinance": YFinanceProvider,
+        "local": LocalDirectoryProvider,
+        "synthetic": SyntheticProvider,
+    }
+    if provider not in providers:
+        raise ValueError(f"Unknown price provider '{provider}'. Options: {list(providers.keys())}")
+    return providers[provider](**kwargs)
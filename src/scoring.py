@@ -1,22 +1,28 @@
-from pprint import pprint
-from datetime import datetime, timedelta
-import copy
+from datetime import datetime, timedelta, time
 import statistics
 import json
+import os
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-from tqdm.auto import tqdm
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 
-from .date_tools import days_ago, days_from_date
-from .tradertrack import TraderTracker
+from .date_tools import add_date_ordinals, transaction_ordinal, date_to_ordinal, trading_calendar
+from .tradertrack import TraderTracker, full_name, DEFAULT_HORIZON, horizon_suffix
 from .stockmarket import StockHistory
 from .util import write_json
 from .models.models import model_predict
-from .stats import normalize
+from .stats import normalize_columns
+from .price_store import round_values
+from .trader_index import TraderScoreIndex
+from .disclosure_table import factorize, to_float
+from .prefetcher import BackgroundPrefetch
 
 def load_json_metrics():
     file_path = "./data/training_data/trading_metrics.json"
@@ -25,26 +31,65 @@ def load_json_metrics():
         
     df = pd.DataFrame(data['scoring_metrics'])
     stock_history = StockHistory(start_date="2012-01-01", end_date=datetime.now().date().strftime("%Y-%m-%d"))
-    deltas = []
-    
-    for i,row in tqdm(df.iterrows(), total=len(df)):
-        date = row['date']
-        future_date = days_from_date(date_str=date, days=365)
-        current_price = stock_history.price(ticker=row['ticker'], date_str=date)
-        future_price = stock_history.price(ticker=row['ticker'], date_str=future_date)
-        if future_price and current_price:
-            price_change = future_price / current_price
-            price_change = round(price_change, 2)
-            deltas.append(price_change)
-        else:
-            deltas.append(None)
+    stock_history.prefetch(tickers=df['ticker'].tolist())
 
-    df['price_change'] = deltas
+    # Label every row with its 365 day price change at once.
+    df['price_change'] = price_changes(stock_history=stock_history, tickers=df['ticker'].tolist(), dates=df['date'].tolist(), zero_is_missing=True)
     # Remove any rows that do not have price_change
     df = df.dropna(subset=['price_change']).reset_index(drop=True)
     df.to_csv('./data/disclosures/stock_metrics.csv', index=False)
     return df
 
+SCORE_WEIGHTS = {
+    "adjusted_purchase_volume": 2,
+    "purchase_speculation": 1,
+    "purchase_count": 1,
+    "purchase_count_individual": 1,
+    "purchase_days_ago": 1,
+    "purchase_confidence": 1,
+    "adjusted_sale_volume": 2,
+    "sale_speculation": 1,
+    "sale_count": 1,
+    "sale_count_individual": 1,
+    "sale_days_ago": 1,
+    "sale_confidence": 1
+}
+PURCHASE_SCORE_KEYS = ["adjusted_purchase_volume", "purchase_speculation", "purchase_count", "purchase_count_individual"]
+SALE_SCORE_KEYS = ["adjusted_sale_volume", "sale_speculation", "sale_count", "sale_count_individual"]
+# Days before each training data analysis date included in its window.
+TRAINING_WINDOW_DAYS = 120
+
+def price_changes(stock_history: StockHistory, tickers: list, dates: list, days: int = 365, zero_is_missing: bool = False) -> np.ndarray:
+    """Labels (ticker, date) rows with the price change over the following {days} days.
+
+    The prices on the dates and {days} days later (moved off weekends) are looked up with
+    two bulk queries against the price store instead of two lookups per row.
+
+    Args:
+        stock_history (StockHistory): Price history to look up the prices in.
+        tickers (list[str]): Ticker of each row.
+        dates (list[str]): Date string ('%Y-%m-%d') of each row.
+        days (int, optional): Number of days to measure the price change over. Defaults to 365.
+        zero_is_missing (bool, optional): Treat a future price of 0 as missing. Defaults to False.
+
+    Returns:
+        np.ndarray: The future price divided by the current price rounded to 2 decimals, NaN where unavailable.
+    """
+    if len(dates) == 0:
+        return np.array([], dtype=np.float64)
+    ordinals = np.array([date_to_ordinal(date) for date in dates], dtype=np.int64)
+    future_ordinals = trading_calendar().weekday_adjusted(ordinals + days)
+    current_prices = stock_history.prices(tickers=tickers, dates=ordinals)
+    future_prices = stock_history.prices(tickers=tickers, dates=future_ordinals)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = round_values(future_prices / current_prices, 2)
+    missing = (current_prices == 0) | np.isnan(current_prices) | np.isnan(future_prices)
+    if zero_is_missing:
+        missing |= future_prices == 0
+    changes[missing] = np.nan
+    return changes
+
 def calculate_score(disclosure: dict):
     """
     This function evaluates the score of a stock based on the following factors that are provided in the disclosure:
@@ -65,24 +110,9 @@ def calculate_score(disclosure: dict):
     Note: The purchase and sale scores are calculated separately and then the net score is calculated by subtracting the sale score from the purchase score.
 
     """
-    weights = {
-        "adjusted_purchase_volume": 2,
-        "purchase_speculation": 1,
-        "purchase_count": 1,
-        "purchase_count_individual": 1,
-        "purchase_days_ago": 1,
-        "purchase_confidence": 1,
-        "adjusted_sale_volume": 2,
-        "sale_speculation": 1,
-        "sale_count": 1,
-        "sale_count_individual": 1,
-        "sale_days_ago": 1,
-        "sale_confidence": 1
-    }
-    pprint(disclosure, '\n')
-
-    purchase_keys = ["adjusted_purchase_volume", "purchase_speculation", "purchase_count", "purchase_count_individual"]
-    sale_keys = ["adjusted_sale_volume", "sale_speculation", "sale_count", "sale_count_individual"]
+    weights = SCORE_WEIGHTS
+    purchase_keys = PURCHASE_SCORE_KEYS
+    sale_keys = SALE_SCORE_KEYS
 
     purchase_values = [disclosure[key]*weights[key] for key in purchase_keys if disclosure[key] is not None]
     sale_values = [disclosure[key]*weights[key] for key in sale_keys if disclosure[key] is not None]
@@ -107,6 +137,49 @@ def calculate_score(disclosure: dict):
     score = purchase_score - sale_score
     return round(score, 2)
 
+def metric_column(metrics, key: str) -> np.ndarray:
+    """Returns a metric of every record as a float array (NaN where missing)."""
+    if isinstance(metrics, pd.DataFrame):
+        return metrics[key].to_numpy(dtype=np.float64)
+    return np.array([np.nan if record[key] is None else record[key] for record in metrics], dtype=np.float64)
+
+def calculate_scores(metrics) -> np.ndarray:
+    """Batched version of normalizing the stock metrics and calling `calculate_score` on each record.
+
+    The metrics are normalized with `stats.normalize_columns`, then weighted, decayed by the
+    days ago and multiplied by the confidence levels as array operations. The scores are
+    identical to `calculate_score(normalize(metrics)[i])`.
+
+    Args:
+        metrics (list[dict] | pd.DataFrame): The stock metrics of one analysis date (e.g. from `AssetTracker.analysis`).
+
+    Returns:
+        np.ndarray: The score of each record, rounded to 2 decimals.
+    """
+    if len(metrics) == 0:
+        return np.array([], dtype=np.float64)
+    columns = {key: metric_column(metrics, key) for key in SCORE_WEIGHTS.keys()}
+    columns.update(normalize_columns(columns))
+
+    side_scores = []
+    for side, keys in [("purchase", PURCHASE_SCORE_KEYS), ("sale", SALE_SCORE_KEYS)]:
+        # Add the weighted values in the same order as `calculate_score`, skipping missing values.
+        side_score = np.zeros(len(metrics), dtype=np.float64)
+        for key in keys:
+            values = columns[key] * SCORE_WEIGHTS[key]
+            side_score = np.where(np.isnan(values), side_score, side_score + values)
+
+        # Adds time decay to the score (more recent trades are weighted higher), unless the days ago are missing or 0.
+        days_ago = columns[f"{side}_days_ago"]
+        decay = ~np.isnan(days_ago) & (days_ago != 0)
+        side_score = np.where(decay, side_score * days_ago, side_score)
+
+        # Multiply the score by the confidence level.
+        side_scores.append(side_score * columns[f"{side}_confidence"])
+
+    # Calculate the net score by subtracting the sale score from the purchase score.
+    return round_values(side_scores[0] - side_scores[1], 2)
+
 def option_moneyness(stock_price: float, strike_price: float, option_type: str) -> str:
     """Determine the moneyness of an option based on the stock price and strike price.
     Moneynees is a term used to describe the relationship between the stock price and the 
@@ -158,91 +231,99 @@ def option_sentiment(stock_price:float, strike_price:float, option_type:str, tra
     sentiment = sentiment_map[option_type][transaction][moneyness]
     return sentiment
 
-def full_name(disclosure):
-    return f"{disclosure['first_name']} {disclosure['last_name']}"
-
-def normalize_asset_values(disclosures: list[dict]) -> list[dict]:
+def normalize_asset_values(disclosures: list[dict]) -> list:
     """Normalize the asset values in the disclosures list on an individual senator basis.
+    The disclosure records are not modified.
 
     Args:
         disclosures (list[dict]): List of parsed disclosure records
     Returns:
-        list[dict]: List of discourse records with normalized asset values based on individual senator's spending.
+        list: The adjusted value of each disclosure record, normalized based on the individual senator's spending.
     """
-    # Get the list of unique congress member names in the disclosures
-    senators = [full_name(disclosure) for disclosure in disclosures]
-    senators = list(set(senators))
-
-    for senator in senators:
-        # Get disclosures for the individual congress member
-        individual_disclosures = [disclosure for disclosure in disclosures if full_name(disclosure) == senator]
-        # Get the approximate asset values for the senator's disclosures based on the average of the low and high values.
-        asset_values = [((disclosure['asset_value_low'] + disclosure['asset_value_high']) / 2) for disclosure in individual_disclosures]
-
-        # Get the min and max asset values for the senator
-        if asset_values:
-            min_val = min(asset_values)
-            max_val = max(asset_values)
-        else:
-            min_val = 0
-            max_val = 0
-
-        # Normalize the asset values for the senator using min-max normalization
-        for i, disclosure in enumerate(disclosures):
-            if full_name(disclosure) == senator:
-                if min_val == max_val:
-                    # If the senator always spends the same amount, set the adjusted value to 1
-                    disclosures[i]['adjusted_value'] = 1
-                else:
-                    # Calculate the normalized asset value
-                    approx_value = (disclosure['asset_value_low'] + disclosure['asset_value_high']) / 2
-                    normalized_value = (approx_value - min_val) / (max_val - min_val)
-                    # Add 1 to the normalized value so the value is between 1 and 2
-                    normalized_value += 1
-                    disclosures[i]['adjusted_value'] = normalized_value
-
-    return disclosures
+    # Get the approximate asset values of the disclosures based on the average of the low and high values.
+    member_ids, senators = factorize([full_name(disclosure) for disclosure in disclosures])
+    asset_values = (to_float([disclosure['asset_value_low'] for disclosure in disclosures]) + to_float([disclosure['asset_value_high'] for disclosure in disclosures])) / 2
+
+    # Get the min and max asset values of every senator in one pass.
+    min_vals = np.full(len(senators), np.inf)
+    max_vals = np.full(len(senators), -np.inf)
+    np.minimum.at(min_vals, member_ids, asset_values)
+    np.maximum.at(max_vals, member_ids, asset_values)
+    min_vals = min_vals[member_ids]
+    max_vals = max_vals[member_ids]
+
+    # Normalize the asset values for each senator using min-max normalization, adding 1 so the value is between 1 and 2.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized_values = (asset_values - min_vals) / (max_vals - min_vals) + 1
+    # If the senator always spends the same amount, set the adjusted value to 1
+    return [1 if same_value else normalized_value for same_value, normalized_value in zip((min_vals == max_vals).tolist(), normalized_values.tolist())]
 
 class AssetTracker:
     """The AssetTracker class is used to analyze the performance of congress members in the stock market.
     """
-    def __init__(self):
-        self.stock_history = StockHistory(start_date="2012-01-01")
-
-    def analysis(self, disclosures: list, end_date: datetime):
+    def __init__(self, stock_history: StockHistory = None, score_index: TraderScoreIndex = None, horizons=(DEFAULT_HORIZON,)):
+        if stock_history:
+            self.stock_history = stock_history
+        else:
+            self.stock_history = StockHistory(start_date="2012-01-01")
+        # Optional as-of index of trader scores shared by analyses at different end dates.
+        self.score_index = score_index
+        # Horizons (in days) of the trader confidence features. Horizons other than 360 days
+        # add 'purchase_confidence_{days}d' and 'sale_confidence_{days}d' metrics.
+        self.horizons = tuple(sorted(set(horizons) | {DEFAULT_HORIZON}))
+
+    def add_confidence(self, metrics: dict, side: str, owner_confidence: dict):
+        """Adds a trader's confidence for every horizon to a stock's 'purchase' or 'sale' metrics."""
+        for horizon in self.horizons:
+            suffix = horizon_suffix(horizon)
+            metrics[f"{side}_confidence{suffix}"].append(owner_confidence[f"{side}{suffix}"])
+
+    def analysis(self, disclosures: list, end_date: datetime, prefetch: BackgroundPrefetch = None):
         """Analyze the performance of congress members in the stock market.
 
         Args:
             disclosures (list): List of disclosure records
             end_date (datetime): The end date for the analysis
+            prefetch (BackgroundPrefetch, optional): Price download already running for the disclosures. Defaults to None.
 
         Returns:
             _type_: List of stock trading activity metrics.
         """
 
         print("- - GETTING TRADER PERFORMANCE - -")
+        # Transaction dates are midnight, so comparing day ordinals matches comparing datetimes.
+        start_date = end_date - timedelta(days=120)
+        start_ordinal = start_date.toordinal() + (1 if start_date.time() != time() else 0)
+        end_ordinal = end_date.toordinal()
+
         # Evaluate the performance of each congress member in the stock market prior to end_date.
         test_disclosures = []
         for disclosure in disclosures:
             # Filter out disclosures that are not within the time window.
-            transaction_date = datetime.strptime(disclosure['transaction_date'], "%Y-%m-%d")
-            if transaction_date <= end_date:
+            if transaction_ordinal(disclosure) <= end_ordinal:
                 test_disclosures.append(disclosure)
 
-        trade_tracker = TraderTracker(disclosures=test_disclosures, stock_history=self.stock_history)
-        trade_tracker.show_results()
-        self.stock_history = trade_tracker.stock_history
+        if self.score_index is not None:
+            # Look up the scores as of end_date instead of re-evaluating every member's history.
+            trader_performance = lambda name: self.score_index.trader_performance(name=name, cutoff=end_ordinal)
+        else:
+            trade_tracker = TraderTracker(disclosures=test_disclosures, stock_history=self.stock_history, horizons=self.horizons, prefetch=prefetch)
+            trade_tracker.show_results()
+            self.stock_history = trade_tracker.stock_history
+            trader_performance = trade_tracker.trader_performance
+        if prefetch is not None:
+            # Never leave the download running once the analysis returns.
+            prefetch.wait()
         print("- - DONE - -\n")
 
         # Normalize the asset values in the disclosures list based on individual senator's spending.
-        disclosures = normalize_asset_values(disclosures=test_disclosures)
+        disclosures = test_disclosures
+        adjusted_values = normalize_asset_values(disclosures=disclosures)
 
         # Filter out disclosures that are not within the time window.
-        start_date = end_date - timedelta(days=120)
         period_disclosures = []
         for disclosure in disclosures:
-            transaction_date = datetime.strptime(disclosure['transaction_date'], "%Y-%m-%d")
-            if start_date <= transaction_date <= end_date:
+            if start_ordinal <= transaction_ordinal(disclosure) <= end_ordinal:
                 period_disclosures.append(disclosure)
 
         # Initialize the metrics tracker for each individual stock that was transacted within period.
@@ -269,12 +350,18 @@ class AssetTracker:
                 'sale_confidence': [],
                 'date': end_date.strftime("%Y-%m-%d")
             }
+            for horizon in self.horizons:
+                if horizon != DEFAULT_HORIZON:
+                    tracker[stock][f"purchase_confidence{horizon_suffix(horizon)}"] = []
+                    tracker[stock][f"sale_confidence{horizon_suffix(horizon)}"] = []
 
         # Calculate trading metrics for each stock within trading window.
-        for disclosure in disclosures:
+        today_ordinal = datetime.now().toordinal()
+        end_days_ago = (datetime.now() - end_date).days
+        for disclosure, adjusted_value in zip(disclosures, adjusted_values):
             # Skip disclosure if it is not within the time window or if it is not a stock / option.
-            transaction_date = datetime.strptime(disclosure['transaction_date'], "%Y-%m-%d")
-            valid_date = (start_date <= transaction_date <= end_date)
+            ordinal = transaction_ordinal(disclosure)
+            valid_date = (start_ordinal <= ordinal <= end_ordinal)
             if (valid_date == False) or (disclosure['asset_code'] not in ["ST", "OP"]) or (disclosure["option_type"] == 'short'):
                 continue
 
@@ -282,34 +369,33 @@ class AssetTracker:
             owner = f"{disclosure['first_name']} {disclosure['last_name']}"
 
             # Retrieve the trader's individual stock trading performance.
-            owner_confidence = trade_tracker.trader_performance(name=owner)
+            owner_confidence = trader_performance(name=owner)
 
             # Calculate the estimated volume of the transaction.
             estimated_volume = (disclosure['asset_value_high'] + disclosure['asset_value_low']) / 2
             estimated_volume = round(estimated_volume, 2)
 
             # Get the number of days ago the transaction occurred.
-            transaction_date = disclosure['transaction_date']
-            transaction_days_ago = days_ago(transaction_date, date_format='%Y-%m-%d') - (datetime.now() - end_date).days
+            transaction_days_ago = (today_ordinal - ordinal) - end_days_ago
 
             # Process record if trader's asset is a stock.
             if disclosure['asset_code'] == "ST":
                 if disclosure['transaction'] == "purchase":
-                    tracker[disclosure['ticker']]['adjusted_purchase_volume'] += disclosure['adjusted_value']
+                    tracker[disclosure['ticker']]['adjusted_purchase_volume'] += adjusted_value
                     tracker[disclosure['ticker']]['estimated_purchase_volume'] += estimated_volume
                     tracker[disclosure['ticker']]['purchase_count'] += 1
                     tracker[disclosure['ticker']]['purchase_owner'].append(owner)
                     tracker[disclosure['ticker']]['purchase_days_ago'].append(transaction_days_ago)
                     if owner_confidence:
-                        tracker[disclosure['ticker']]['purchase_confidence'].append(owner_confidence['purchase'])
+                        self.add_confidence(tracker[disclosure['ticker']], 'purchase', owner_confidence)
                 else:
-                    tracker[disclosure['ticker']]['adjusted_sale_volume'] += disclosure['adjusted_value']
+                    tracker[disclosure['ticker']]['adjusted_sale_volume'] += adjusted_value
                     tracker[disclosure['ticker']]['estimated_sale_volume'] += estimated_volume
                     tracker[disclosure['ticker']]['sale_count'] += 1
                     tracker[disclosure['ticker']]['sale_owner'].append(owner)
                     tracker[disclosure['ticker']]['sale_days_ago'].append(transaction_days_ago)
                     if owner_confidence:
-                        tracker[disclosure['ticker']]['sale_confidence'].append(owner_confidence['sale'])
+                        self.add_confidence(tracker[disclosure['ticker']], 'sale', owner_confidence)
                     
             # Process record if trader's asset is a stock option.
             elif disclosure['asset_code'] == "OP":
@@ -320,22 +406,22 @@ class AssetTracker:
 
                 if speculation_score < 0:
                     # Owner is betting against the stock price falling
-                    tracker[disclosure['ticker']]['adjusted_sale_volume'] += disclosure['adjusted_value']
+                    tracker[disclosure['ticker']]['adjusted_sale_volume'] += adjusted_value
                     tracker[disclosure['ticker']]['estimated_sale_volume'] += estimated_volume
                     tracker[disclosure['ticker']]['sale_count'] += 1
                     tracker[disclosure['ticker']]['sale_speculation'] += abs(speculation_score)
                     tracker[disclosure['ticker']]['sale_days_ago'].append(transaction_days_ago)
                     if owner_confidence:
-                        tracker[disclosure['ticker']]['sale_confidence'].append(owner_confidence['sale'])
+                        self.add_confidence(tracker[disclosure['ticker']], 'sale', owner_confidence)
                 else:
                     # Owner is betting on the stock price growing
-                    tracker[disclosure['ticker']]['adjusted_purchase_volume'] += disclosure['adjusted_value']
+                    tracker[disclosure['ticker']]['adjusted_purchase_volume'] += adjusted_value
                     tracker[disclosure['ticker']]['estimated_purchase_volume'] += estimated_volume
                     tracker[disclosure['ticker']]['purchase_count'] += 1
                     tracker[disclosure['ticker']]['purchase_speculation'] += abs(speculation_score)
                     tracker[disclosure['ticker']]['purchase_days_ago'].append(transaction_days_ago)
                     if owner_confidence:
-                        tracker[disclosure['ticker']]['purchase_confidence'].append(owner_confidence['purchase'])
+                        self.add_confidence(tracker[disclosure['ticker']], 'purchase', owner_confidence)
         
 
         # Process tracker data.
@@ -357,8 +443,9 @@ class AssetTracker:
                 results[i]['sale_days_ago'] = None
 
             # Set purchase and sale confidence levels
-            results[i]['purchase_confidence'] = max(results[i]['purchase_confidence']) if results[i]['purchase_confidence'] else 0
-            results[i]['sale_confidence'] = max(results[i]['sale_confidence']) if results[i]['sale_confidence'] else 0
+            for horizon in self.horizons:
+                for key in [f"purchase_confidence{horizon_suffix(horizon)}", f"sale_confidence{horizon_suffix(horizon)}"]:
+                    results[i][key] = max(results[i][key]) if results[i][key] else 0
 
             # Identify congress people who transacted the stock / option asset.
             results[i]['purchase_owner'] = list(set(result['purchase_owner']))
@@ -373,45 +460,404 @@ class AssetTracker:
 
         return final_results
 
-def rank_stocks(disclosures:list, end_date:datetime, mode:str='run', refresh_train: bool=False):
-    asset_tracker = AssetTracker()
+class RollingAssetTracker:
+    """Computes the `AssetTracker.analysis` metrics for a sequence of end dates incrementally.
+
+    Instead of filtering every disclosure and rebuilding each stock's metrics for every end
+    date, the analysis dates are walked in order and each stock's purchase / sale aggregates
+    (counts, volumes, speculation, owners and days ago sums) are updated as trades enter and
+    leave the 120 day window. Trader confidence comes from an as-of TraderScoreIndex, and
+    each member's asset value range is tracked as of the end date, the same as
+    `normalize_asset_values` over the disclosures up to that date.
+
+    Adjusted volumes are summed per member, so they can differ from `AssetTracker.analysis`
+    in the last floating point digits. All other metrics are identical.
+    """
+    def __init__(self, disclosures: list[dict], score_index: TraderScoreIndex, horizons=(DEFAULT_HORIZON,), window_days: int = 120):
+        """
+        Args:
+            disclosures (list[dict]): List of disclosure records
+            score_index (TraderScoreIndex): As-of trader scores covering the disclosures and horizons.
+            horizons (tuple[int], optional): Horizons of the trader confidence metrics. Defaults to (360,).
+            window_days (int, optional): Number of days before the end date included in the window. Defaults to 120.
+        """
+        self.score_index = score_index
+        self.horizons = tuple(sorted(set(horizons) | {DEFAULT_HORIZON}))
+        self.window_days = window_days
+
+        # Range of every member's approximate asset values as of each of their transaction dates.
+        member_values = {}
+        for disclosure in disclosures:
+            approx_value = (disclosure['asset_value_low'] + disclosure['asset_value_high']) / 2
+            member_values.setdefault(full_name(disclosure), []).append((transaction_ordinal(disclosure), approx_value))
+        self.value_ranges = {}
+        for member, values in member_values.items():
+            values.sort(key=lambda value: value[0])
+            approx_values = np.array([value[1] for value in values], dtype=np.float64)
+            self.value_ranges[member] = (
+                np.array([value[0] for value in values], dtype=np.int64),
+                np.minimum.accumulate(approx_values),
+                np.maximum.accumulate(approx_values),
+            )
+
+        # Trades that count towards the stock metrics, sorted by transaction date.
+        self.trades = []
+        for disclosure in disclosures:
+            if (disclosure['asset_code'] not in ["ST", "OP"]) or (disclosure["option_type"] == 'short'):
+                continue
+            speculation_score = 0
+            if disclosure['asset_code'] == "ST":
+                side = "purchase" if disclosure['transaction'] == "purchase" else "sale"
+            else:
+                speculation_score = option_sentiment(disclosure['stock_price'], disclosure['strike_price'], disclosure['option_type'], disclosure['transaction'])
+                # A negative score means the owner is betting on the stock price falling.
+                side = "sale" if speculation_score < 0 else "purchase"
+            self.trades.append({
+                "ordinal": transaction_ordinal(disclosure),
+                "ticker": disclosure['ticker'],
+                "owner": full_name(disclosure),
+                "side": side,
+                "stock": disclosure['asset_code'] == "ST",
+                "approx_value": (disclosure['asset_value_low'] + disclosure['asset_value_high']) / 2,
+                "estimated_volume": round((disclosure['asset_value_high'] + disclosure['asset_value_low']) / 2, 2),
+                "speculation": abs(speculation_score),
+            })
+        self.trades.sort(key=lambda trade: trade["ordinal"])
+        # Results are listed in order of each stock's first disclosure, however the window got to a date.
+        self.ticker_order = {}
+        for disclosure in disclosures:
+            self.ticker_order.setdefault(disclosure['ticker'], len(self.ticker_order))
+
+        self.stocks = {}
+        self.entered = 0
+        self.left = 0
+        self.end_ordinal = None
+
+    def update(self, trade: dict, sign: int):
+        """Adds (sign=1) or removes (sign=-1) a trade from its stock's aggregates."""
+        if trade["ticker"] not in self.stocks:
+            self.stocks[trade["ticker"]] = {
+                side: {"count": 0, "estimated_volume": 0.0, "speculation": 0, "ordinal_sum": 0, "owners": {}, "traders": {}, "values": {}}
+                for side in ["purchase", "sale"]
+            }
+        side = self.stocks[trade["ticker"]][trade["side"]]
+        side["count"] += sign
+        side["estimated_volume"] += sign * trade["estimated_volume"]
+        side["speculation"] += sign * trade["speculation"]
+        side["ordinal_sum"] += sign * trade["ordinal"]
+
+        owner = trade["owner"]
+        # Only stock trades count as owners, options only contribute the trader's confidence.
+        groups = [side["traders"], side["owners"]] if trade["stock"] else [side["traders"]]
+        for group in groups:
+            group[owner] = group.get(owner, 0) + sign
+            if group[owner] == 0:
+                del group[owner]
+
+        count, value_sum = side["values"].get(owner, (0, 0.0))
+        if count + sign == 0:
+            del side["values"][owner]
+        else:
+            side["values"][owner] = (count + sign, value_sum + sign * trade["approx_value"])
+
+    def value_range(self, owner: str):
+        ordinals, min_values, max_values = self.value_ranges[owner]
+        index = int(np.searchsorted(ordinals, self.end_ordinal, side="right")) - 1
+        return min_values[index], max_values[index]
+
+    def adjusted_volume(self, side: dict):
+        """Sum of the trades' asset values min-max normalized per owner to the range 1-2."""
+        volume = 0
+        for owner, (count, value_sum) in sorted(side["values"].items()):
+            min_val, max_val = self.value_range(owner)
+            if min_val == max_val:
+                volume += count
+            else:
+                volume += count + float((value_sum - count * min_val) / (max_val - min_val))
+        return volume
+
+    def analysis(self, end_date: datetime):
+        """Returns the stock trading activity metrics of the 120 day window ending on end_date.
+
+        Args:
+            end_date (datetime): The end date for the analysis, not before the previous one.
+
+        Returns:
+            list[dict]: List of stock trading activity metrics, the same as `AssetTracker.analysis`.
+        """
+        # Transaction dates are midnight, so comparing day ordinals matches comparing datetimes.
+        start_date = end_date - timedelta(days=self.window_days)
+        start_ordinal = start_date.toordinal() + (1 if start_date.time() != time() else 0)
+        end_ordinal = end_date.toordinal()
+        if self.end_ordinal is not None and end_ordinal < self.end_ordinal:
+            raise ValueError("End dates must be analyzed in chronological order.")
+        self.end_ordinal = end_ordinal
+
+        # Add the trades entering the window, then remove the trades leaving it.
+        while self.entered < len(self.trades) and self.trades[self.entered]["ordinal"] <= end_ordinal:
+            self.update(self.trades[self.entered], 1)
+            self.entered += 1
+        while self.left < self.entered and self.trades[self.left]["ordinal"] < start_ordinal:
+            self.update(self.trades[self.left], -1)
+            self.left += 1
+
+        today_ordinal = datetime.now().toordinal()
+        end_days_ago = (datetime.now() - end_date).days
+        performance = {}
+        results = []
+        for ticker, stock in list(self.stocks.items()):
+            purchase, sale = stock["purchase"], stock["sale"]
+            if purchase["count"] == 0 and sale["count"] == 0:
+                del self.stocks[ticker]
+                continue
+            if not purchase["owners"] and not sale["owners"]:
+                continue
+
+            result = {"ticker": ticker}
+            for name, side in [("purchase", purchase), ("sale", sale)]:
+                count = side["count"]
+                # Sum of the days ago of the trades, from the sum of their day ordinals.
+                days_ago_sum = count * (today_ordinal - end_days_ago) - side["ordinal_sum"]
+                if count == 0:
+                    days_ago = None
+                else:
+                    days_ago = days_ago_sum // count if days_ago_sum % count == 0 else days_ago_sum / count
+                    days_ago = round(days_ago, 2)
+
+                for owner in side["traders"]:
+                    if owner not in performance:
+                        performance[owner] = self.score_index.trader_performance(name=owner, cutoff=end_ordinal)
+
+                result[f"adjusted_{name}_volume"] = self.adjusted_volume(side)
+                result[f"estimated_{name}_volume"] = side["estimated_volume"] if count else 0
+                result[f"{name}_speculation"] = side["speculation"]
+                result[f"{name}_count"] = count
+                result[f"{name}_count_individual"] = len(side["owners"])
+                result[f"{name}_days_ago"] = days_ago
+                result[f"{name}_owner"] = sorted(side["owners"])
+                confidences = [performance[owner][name] for owner in side["traders"] if performance[owner]]
+                result[f"{name}_confidence"] = max(confidences) if confidences else 0
+
+            result['date'] = end_date.strftime("%Y-%m-%d")
+            for horizon in self.horizons:
+                if horizon == DEFAULT_HORIZON:
+                    continue
+                suffix = horizon_suffix(horizon)
+                for name, side in [("purchase", purchase), ("sale", sale)]:
+                    confidences = [performance[owner][f"{name}{suffix}"] for owner in side["traders"] if performance[owner]]
+                    result[f"{name}_confidence{suffix}"] = max(confidences) if confidences else 0
+            result['volume_net'] = result['estimated_purchase_volume'] - result['estimated_sale_volume']
+            results.append(result)
+
+        return sorted(results, key=lambda result: self.ticker_order[result['ticker']])
+
+def training_fingerprint(disclosures: list[dict], stock_history: StockHistory, horizons: tuple, start_date: datetime, step_days: int, window_days: int) -> dict:
+    """Describes the inputs of a training data run, so a checkpoint is only resumed by an identical run.
+
+    Args:
+        disclosures (list[dict]): List of disclosure records
+        stock_history (StockHistory): Price history the metrics are computed from.
+        horizons (tuple[int]): Horizons of the trader confidence metrics.
+        start_date (datetime): First analysis date.
+        step_days (int): Number of days between analysis dates.
+        window_days (int): Number of days before each analysis date included in its window.
+
+    Returns:
+        dict: The checkpoint header of the run.
+    """
+    digest = hashlib.sha256()
+    for doc_id, transaction_date in sorted((str(disclosure.get('doc_id')), str(disclosure['transaction_date'])) for disclosure in disclosures):
+        digest.update(f"{doc_id}|{transaction_date}\n".encode())
+    return {
+        "horizons": list(horizons),
+        "disclosures": len(disclosures),
+        "disclosures_hash": digest.hexdigest(),
+        "provider": stock_history.provider.cache_name,
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "step_days": step_days,
+        "window_days": window_days,
+    }
+
+def start_training_checkpoint(path: str, fingerprint: dict):
+    """Starts an empty training data checkpoint, replacing any previous one."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(json.dumps(fingerprint) + "\n")
+
+def append_training_checkpoint(path: str, date: datetime, results: list[dict]):
+    """Records the stock metrics of a completed analysis date in the training data checkpoint."""
+    with open(path, 'a') as file:
+        file.write(json.dumps({"date": date.strftime("%Y-%m-%d"), "results": results}) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+def load_training_checkpoint(path: str, fingerprint: dict) -> dict:
+    """Loads the analysis dates completed by previous training data runs.
+
+    The checkpoint is a JSON lines file starting with the fingerprint of the run that
+    built it (see `training_fingerprint`), followed by one line per completed analysis
+    date. A line cut off by an interrupted run is dropped.
+
+    Args:
+        path (str): Path of the checkpoint file.
+        fingerprint (dict): Fingerprint of the current run.
+
+    Returns:
+        dict: Date string to that date's stock metrics. Empty if there is no usable checkpoint.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, 'r') as file:
+        lines = file.readlines()
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+    if not entries or entries[0] != fingerprint:
+        print(f"Ignoring the training data checkpoint '{path}' built from different disclosures, prices or analysis dates.")
+        return {}
+
+    if len(entries) < len(lines):
+        # Rewrite the checkpoint without the incomplete line so new dates can be appended.
+        with open(path, 'w') as file:
+            file.writelines(lines[:len(entries)])
+    return {entry["date"]: entry["results"] for entry in entries[1:]}
+
+def collect_training_metrics(disclosures: list[dict], score_index: TraderScoreIndex, dates: list[datetime], horizons=(DEFAULT_HORIZON,), checkpoint_path: str = None) -> list[dict]:
+    """Collects the scored stock metrics of every analysis date for the training data.
+
+    Args:
+        disclosures (list[dict]): List of disclosure records
+        score_index (TraderScoreIndex): As-of trader scores covering the disclosures and horizons.
+        dates (list[datetime]): Analysis dates in chronological order.
+        horizons (tuple[int], optional): Horizons of the trader confidence metrics. Defaults to (360,).
+        checkpoint_path (str, optional): Training data checkpoint to record each completed date in. Defaults to None.
+
+    Returns:
+        list[dict]: The stock metrics of all dates, in date order.
+    """
+    trading_metrics = []
+    # Walk the analysis dates in order, updating the stock metrics as trades enter and leave the window.
+    rolling_tracker = RollingAssetTracker(disclosures=disclosures, score_index=score_index, horizons=horizons, window_days=TRAINING_WINDOW_DAYS)
+    for date in dates:
+        print(f"Collecting data for {date.strftime('%Y-%m-%d')}")
+        results = rolling_tracker.analysis(end_date=date)
+
+        # Normalize data to weigh different factors evenly and score every stock at once.
+        for result, score in zip(results, calculate_scores(metrics=results).tolist()):
+            result['score'] = score
+
+        if checkpoint_path:
+            append_training_checkpoint(path=checkpoint_path, date=date, results=results)
+        trading_metrics.extend(results)
+    return trading_metrics
+
+# Inputs of a training metrics worker process, read once per process by `init_training_worker`.
+TRAINING_WORKER = {}
+
+def init_training_worker(disclosures_path: str, score_index_path: str):
+    with open(disclosures_path, 'r') as file:
+        TRAINING_WORKER["disclosures"] = json.load(file)
+    TRAINING_WORKER["score_index"] = TraderScoreIndex.load(score_index_path)
+
+def collect_training_metrics_chunk(dates: list[datetime], horizons: tuple) -> list[dict]:
+    """Process pool entry point of `collect_training_metrics` using the worker's disclosures and trader scores."""
+    return collect_training_metrics(disclosures=TRAINING_WORKER["disclosures"], score_index=TRAINING_WORKER["score_index"], dates=dates, horizons=horizons)
+
+def collect_training_metrics_parallel(disclosures: list[dict], score_index: TraderScoreIndex, dates: list[datetime], horizons=(DEFAULT_HORIZON,), workers: int = 4, checkpoint_path: str = None) -> list[dict]:
+    """Collects the training metrics on a process pool, in contiguous ranges of dates.
+
+    The disclosures and the trader score index are written once to a temporary directory
+    and read once by each of the {workers} processes, which then walk their ranges of dates
+    with a rolling window. The results are gathered in date order, the same as
+    `collect_training_metrics`.
+
+    Args:
+        disclosures (list[dict]): List of disclosure records
+        score_index (TraderScoreIndex): As-of trader scores covering the disclosures and horizons.
+        dates (list[datetime]): Analysis dates in chronological order.
+        horizons (tuple[int], optional): Horizons of the trader confidence metrics. Defaults to (360,).
+        workers (int, optional): Number of worker processes. Defaults to 4.
+        checkpoint_path (str, optional): Training data checkpoint to record each completed date in. Defaults to None.
+
+    Returns:
+        list[dict]: The stock metrics of all dates, in date order.
+    """
+    # Several ranges per worker, queued on the pool, so the checkpoint keeps up while it is busy.
+    chunk_count = min(len(dates), workers * 4)
+    chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(dates)), chunk_count) if len(chunk)]
+    trading_metrics = []
+    with tempfile.TemporaryDirectory(prefix="training-metrics-") as directory:
+        disclosures_path = os.path.join(directory, "disclosures.json")
+        score_index_path = os.path.join(directory, "trader_scores.npz")
+        with open(disclosures_path, 'w') as file:
+            json.dump(disclosures, file)
+        score_index.save(score_index_path)
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=init_training_worker, initargs=(disclosures_path, score_index_path)) as executor:
+            futures = [
+                executor.submit(collect_training_metrics_chunk, [dates[i] for i in chunk], horizons)
+                for chunk in chunks
+            ]
+            for chunk, future in zip(chunks, futures):
+                results = future.result()
+                if checkpoint_path:
+                    for i in chunk:
+                        date_str = dates[i].strftime("%Y-%m-%d")
+                        append_training_checkpoint(path=checkpoint_path, date=dates[i], results=[result for result in results if result['date'] == date_str])
+                trading_metrics.extend(results)
+    return trading_metrics
+
+def rank_stocks(disclosures:list, end_date:datetime, mode:str='run', refresh_train: bool=False, stock_history: StockHistory=None, horizons=(DEFAULT_HORIZON,), workers: int=1, resume: bool=True):
+    asset_tracker = AssetTracker(stock_history=stock_history, horizons=horizons)
+    prefetch = None
+    if mode == 'run' and not refresh_train:
+        # Download the price history of every traded ticker while the disclosures are prepared.
+        prefetch = BackgroundPrefetch(stock_history=asset_tracker.stock_history, tickers=[disclosure['ticker'] for disclosure in disclosures])
+    # Parse the disclosure dates once so the analysis windows use integer day ordinals.
+    add_date_ordinals(disclosures)
 
     if refresh_train:
-        trading_metrics = []
         # Collect data for training the model
-        date = datetime(2013, 1, 1)
+        start_date, step_days = datetime(2013, 1, 1), 60
+        dates = []
+        date = start_date
         while date < (datetime.now() - timedelta(days=372)):
-            print(f"Collecting data for {end_date.strftime('%Y-%m-%d')}")
-            results = asset_tracker.analysis(copy.deepcopy(disclosures), date)
-
-            # Normalize data to weigh different factors evenly.
-            normalized_data = normalize(disclosures=copy.deepcopy(results))
-            for i, _ in enumerate(normalized_data):
-                results[i]['score'] = calculate_score(disclosure=normalized_data[i])
+            dates.append(date)
+            date = date + timedelta(days=step_days)
+
+        # Resume from the analysis dates completed by previous runs with the same inputs, only new dates are computed.
+        checkpoint_path = './data/training_data/stock_metrics_checkpoint.jsonl'
+        fingerprint = training_fingerprint(disclosures=disclosures, stock_history=asset_tracker.stock_history, horizons=asset_tracker.horizons, start_date=start_date, step_days=step_days, window_days=TRAINING_WINDOW_DAYS)
+        completed = load_training_checkpoint(path=checkpoint_path, fingerprint=fingerprint) if resume else {}
+        if not completed:
+            start_training_checkpoint(path=checkpoint_path, fingerprint=fingerprint)
+        pending = [date for date in dates if date.strftime("%Y-%m-%d") not in completed]
+        print(f"Collecting data for {len(pending)} analysis dates ({len(dates) - len(pending)} restored from '{checkpoint_path}').")
+
+        if pending:
+            # Evaluate every member's trades once and answer each analysis date from the index.
+            asset_tracker.score_index = TraderScoreIndex.build(disclosures=disclosures, stock_history=asset_tracker.stock_history, horizons=asset_tracker.horizons)
+
+            if workers > 1:
+                collect_training_metrics_parallel(disclosures=disclosures, score_index=asset_tracker.score_index, dates=pending, horizons=asset_tracker.horizons, workers=workers, checkpoint_path=checkpoint_path)
+            else:
+                collect_training_metrics(disclosures=disclosures, score_index=asset_tracker.score_index, dates=pending, horizons=asset_tracker.horizons, checkpoint_path=checkpoint_path)
+            completed = load_training_checkpoint(path=checkpoint_path, fingerprint=fingerprint)
 
-            trading_metrics.extend(results)
-            date = date + timedelta(days=60)
+        # Label every row, including rows of earlier runs whose future prices were not available yet.
+        trading_metrics = [result for date in dates for result in completed.get(date.strftime("%Y-%m-%d"), [])]
         
         df = pd.DataFrame(trading_metrics)
         stock_history = asset_tracker.stock_history
-        deltas = []
-        
+
         # Add price deltas to the dataframe
-        for i,row in tqdm(df.iterrows(), total=len(df)):
-            date = row['date']
-            future_date = days_from_date(date_str=date, days=365)
-            current_price = stock_history.price(ticker=row['ticker'], date_str=date)
-            future_price = stock_history.price(ticker=row['ticker'], date_str=future_date)
-
-            try:
-                price_change = future_price / current_price
-                price_change = round(price_change, 2)
-                deltas.append(price_change)
-            except:
-                deltas.append(None)
-
-        # Remove any None values from the deltas
-        df['price_change'] = deltas
+        df['price_change'] = price_changes(stock_history=stock_history, tickers=df['ticker'].tolist(), dates=df['date'].tolist())
+
+        # Remove any rows without a price delta
         df = df.dropna(subset=['price_change']).reset_index(drop=True)
 
         df['sale_days_ago'] = df['sale_days_ago'].fillna(-1)
@@ -479,13 +925,15 @@ def rank_stocks(disclosures:list, end_date:datetime, mode:str='run', refresh_tra
 
 
     elif mode == 'run':
+        if prefetch is None:
+            prefetch = BackgroundPrefetch(stock_history=asset_tracker.stock_history, tickers=[disclosure['ticker'] for disclosure in disclosures])
+
         # Calculating trading metrics for each stock.
-        results = asset_tracker.analysis(copy.deepcopy(disclosures), end_date)
+        results = asset_tracker.analysis(disclosures, end_date, prefetch=prefetch)
 
-        # Normalize data to weigh different factors evenly.
-        normalized_data = normalize(disclosures=copy.deepcopy(results))
-        for i, _ in enumerate(normalized_data):
-            results[i]['score'] = calculate_score(disclosure=normalized_data[i])
+        # Normalize data to weigh different factors evenly and score every stock at once.
+        for result, score in zip(results, calculate_scores(metrics=results).tolist()):
+            result['score'] = score
 
         # predictions = model_predict(records=copy.deepcopy(results))
 
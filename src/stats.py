@@ -1,5 +1,19 @@
 import math
 
+import numpy as np
+
+# Metrics scaled between 0 and 1 by `normalize`.
+NORMALIZED_KEYS = [
+    "purchase_count",
+    "purchase_count_individual",
+    "purchase_speculation",
+    "purchase_days_ago",
+    "sale_count",
+    "sale_count_individual",
+    "sale_speculation",
+    "sale_days_ago"
+]
+
 def time_decay(x):
     e = math.e
     return (math.exp(x) - 1) / (e - 1)
@@ -7,6 +21,7 @@ def time_decay(x):
 def normalize(disclosures: list[dict]) -> list[dict]:
     """Normalize the values in the disclosures list.
     Uses min-max normalization to scale the values between 0 and 1.
+    The records are not modified, normalized values are written to copies.
 
     Args:
         disclosures (list[dict]): List of parsed disclosure records
@@ -14,16 +29,7 @@ def normalize(disclosures: list[dict]) -> list[dict]:
     Returns:
         list[dict]: Normalized list of disclosure records
     """
-    keys_to_normalize = [
-        "purchase_count",
-        "purchase_count_individual",
-        "purchase_speculation",
-        "purchase_days_ago",
-        "sale_count",
-        "sale_count_individual",
-        "sale_speculation",
-        "sale_days_ago"
-    ]
+    keys_to_normalize = NORMALIZED_KEYS
     
     min_max_values = {}
     
@@ -34,7 +40,11 @@ def normalize(disclosures: list[dict]) -> list[dict]:
         else:
             min_max_values[key] = (0, 0)
 
+    normalized = []
     for disclosure in disclosures:
+        # Shallow copy, only the normalized numeric values are replaced.
+        disclosure = dict(disclosure)
+        normalized.append(disclosure)
         for key in keys_to_normalize:
             min_val, max_val = min_max_values[key]
             value = disclosure.get(key)
@@ -49,4 +59,29 @@ def normalize(disclosures: list[dict]) -> list[dict]:
                 else:
                     disclosure[key] = (value - min_val) / (max_val - min_val)
 
-    return disclosures
\ No newline at end of file
+    return normalized
+
+def normalize_columns(columns: dict) -> dict:
+    """Column-wise version of `normalize` over arrays of metrics.
+
+    Args:
+        columns (dict): Metric name to a float array with one value per record (NaN where missing).
+
+    Returns:
+        dict: The normalized arrays of the `NORMALIZED_KEYS` metrics (NaN where missing).
+    """
+    normalized = {}
+    for key in NORMALIZED_KEYS:
+        values = np.asarray(columns[key], dtype=np.float64)
+        present = ~np.isnan(values)
+        if not present.any() or values[present].min() == values[present].max():
+            normalized[key] = np.where(present, 0.0, np.nan)
+            continue
+
+        min_val, max_val = values[present].min(), values[present].max()
+        scaled = (values - min_val) / (max_val - min_val)
+        if key in ['sale_days_ago', 'purchase_days_ago']:
+            # Days ago scores should be inverted so that the score is higher the more recent the date is.
+            scaled = 1 - scaled
+        normalized[key] = scaled
+    return normalized
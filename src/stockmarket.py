@@ -1,27 +1,64 @@
-import yfinance as yf
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pprint import pprint
 import traceback
 from datetime import datetime, timedelta
-from bisect import bisect_left
+import numpy as np
 
-from .date_tools import nearest_monday, get_most_recent_weekday, get_next_day, us_holidays, days_ago, days_from_date
+from .date_tools import nearest_monday, get_most_recent_weekday, get_next_day, days_ago, days_from_date, trading_calendar, date_to_ordinal, ordinal_to_date
 from .logger import logger
+from .price_store import PriceStore, PriceCache, PriceMatrix, NegativeCache, TickerPrices, nearest_sessions, round_values
+from .providers import get_provider
+
+DEFAULT_CACHE_DIR = f"{os.path.dirname(__file__)}/../data/price_cache"
+# Maximum number of memoized single price lookups, across all tickers.
+MEMO_SIZE = 100_000
+# Number of cached days downloaded again next to a missing range to detect price adjustments.
+REFRESH_OVERLAP_DAYS = 10
 
 class StockHistory:
     # The __init__ method initializes the object's attributes
-    def __init__(self, start_date: str, end_date: str=None):
+    def __init__(self, start_date: str, end_date: str=None, cache_dir: str=DEFAULT_CACHE_DIR, offline: bool=False, negative_ttl_days: float=30, provider="yfinance", price_matrix=None, memory_budget: int=None, **provider_options):
         # Expected Date Format: '%Y-%m-%d'
+        # provider: Price source, 'yfinance', 'local', 'synthetic' or a PriceProvider instance.
+        # provider_options: Provider arguments (e.g. directory='./prices' for 'local', seed=42 for 'synthetic').
+        # price_matrix: Path to (or instance of) a shared PriceMatrix to serve prices from, read-only.
+        # memory_budget: Maximum bytes of price history kept in memory, least recently used tickers are evicted.
+        # cache_dir: Directory of the persistent price cache (None disables it).
+        # offline: Only serve prices from the persistent cache, never download.
+        # negative_ttl_days: Number of days before a failed ticker or date lookup is retried.
         self.date_format = "%Y-%m-%d"
         self.start_date = start_date
         if end_date is None:
             self.end_date = (datetime.now() - timedelta(days=1)).strftime(self.date_format)
         else:
             self.end_date = end_date
-        self.holidays = us_holidays()
+        self.calendar = trading_calendar()
+
+        self.provider = get_provider(provider, **provider_options)
+        if cache_dir and self.provider.cache_name:
+            # Each provider keeps its own folder so synthetic prices never mix with real ones.
+            cache_dir = os.path.join(cache_dir, self.provider.cache_name)
+        else:
+            cache_dir = None
+
+        # Memoized results of single price lookups, {ticker: {date string: price}}.
+        self.price_memo = {}
+        self.memo_entries = 0
 
-        self.cache = {}
+        if price_matrix is not None:
+            # A shared matrix is read-only, so nothing is downloaded or written to disk.
+            self.cache = price_matrix if isinstance(price_matrix, PriceMatrix) else PriceMatrix.open(price_matrix)
+            cache_dir = None
+            offline = True
+        else:
+            self.cache = PriceStore(max_bytes=memory_budget, on_evict=self.clear_memo)
+        self.disk_cache = PriceCache(directory=cache_dir) if cache_dir else None
+        self.offline = offline
         self.ticker_map = {"FB": "META", "BRK.B": "BRK-B", "BRKB": "BRK-B"}
-        self.invalid_tickers = []
+        negative_path = os.path.join(cache_dir, "negative_cache.jsonl") if cache_dir else None
+        self.negative_cache = NegativeCache(path=negative_path, ttl_days=negative_ttl_days)
 
     def price(self, ticker: str, date_str: str = None):
         try:
@@ -30,61 +67,495 @@ class StockHistory:
             # Skip if the ticker is invalid
             return None
 
-        if ticker not in self.cache.keys():
+        if ticker not in self.cache:
             # Update the stock history cache with new ticker.
             response = self.update_cache(ticker=ticker)
             if response == 500:
                 # Return None no data is available for the ticker
                 return None
 
+        if not date_str:
+            # Set default date to yesterday if date is not provided.
+            date_str = (datetime.now() - timedelta(days=1)).strftime(self.date_format)
+
+        memo = self.price_memo.get(ticker)
+        if memo is not None and date_str in memo:
+            return memo[date_str]
+
+        if self.negative_cache.has_date(ticker, date_str):
+            return None
+
         try:
-            if not date_str:
-                # Set default date to yesterday if date is not provided.
-                date_str = (datetime.now() - timedelta(days=1)).strftime(self.date_format)
+            target = int(self.calendar.closest_weekday(date_to_ordinal(date_str, self.date_format)))
 
-            date = self.closest_weekday(date_str=date_str)
-            date_obj = datetime.strptime(date, self.date_format)
+            # Get the nearest available session for the stock price.
+            ticker_prices = self.cache[ticker]
+            index = self.find_nearest_date(ticker_prices.sessions, target)
+            if index is None:
+                logger.warning(f"WARNING: No available date within two weeks for '{ticker}' on '{date_str}'.")
+                self.negative_cache.add_date(ticker, date_str)
+                self.memoize(ticker, date_str, None)
+                return None
 
-            # Check if the exact date is in the cache
-            if date in self.cache[ticker]:
-                nearest_date = date_obj
-            else:
-                # Get the nearest available date for the stock price.
-                nearest_date = self.find_nearest_date(self.cache[ticker].keys(), date_obj)
-                if nearest_date is None:
-                    logger.warning(f"WARNING: No available date within two weeks for '{ticker}' on '{date_str}'.")
-                    return None
-
-            #pprint(self.cache[ticker][nearest_date.strftime(self.date_format)])
-            price = self.cache[ticker][nearest_date.strftime(self.date_format)]["Close"]
+            price = float(ticker_prices.close[index])
+            if np.isnan(price):
+                # The ticker did not trade on this session of a shared price matrix.
+                self.memoize(ticker, date_str, None)
+                return None
             price = round(price, 2)
+            self.memoize(ticker, date_str, price)
             return price
         except Exception as e:
             logger.warning(f"\nWARNING: Error retrieving price for '{ticker}' on '{date_str}'.")
             return None
 
+    def prices(self, tickers, dates):
+        """Bulk price lookup for many (ticker, date) pairs.
+
+        Each date is adjusted to the closest weekday and resolved to the nearest trading
+        session within two weeks, the same as `price`, but all dates of a ticker are
+        resolved with a single sorted search.
+
+        Args:
+            tickers (str | list[str]): A single ticker for every date, or one ticker per date.
+            dates (list[str] | np.ndarray): Date strings ('%Y-%m-%d') or integer day ordinals.
+
+        Returns:
+            np.ndarray: Closing prices rounded to 2 decimals, NaN where no price is available.
+        """
+        targets = self.date_ordinals(dates)
+        if isinstance(tickers, str):
+            tickers = [tickers] * len(targets)
+        if len(tickers) != len(targets):
+            raise ValueError("The number of tickers and dates must match.")
+
+        results = np.full(len(targets), np.nan, dtype=np.float64)
+        if len(targets) == 0:
+            return results
+
+        # Rows without a ticker symbol (None or NaN) have no price.
+        tickers = np.asarray(tickers, dtype=object)
+        has_ticker = np.flatnonzero([isinstance(ticker, str) for ticker in tickers])
+        unique_tickers, inverse = np.unique(tickers[has_ticker].astype(str), return_inverse=True)
+        for i, raw_ticker in enumerate(unique_tickers):
+            try:
+                ticker = self.validate_ticker(ticker=raw_ticker)
+            except:
+                continue
+            if ticker not in self.cache:
+                if self.update_cache(ticker=ticker) != 200:
+                    continue
+
+            rows = has_ticker[inverse == i]
+            ticker_prices = self.cache[ticker]
+            index = nearest_sessions(ticker_prices.sessions, targets[rows])
+            found = index >= 0
+            results[rows[found]] = ticker_prices.close[index[found]]
+
+        return round_values(results, 2)
+
+    def date_ordinals(self, dates):
+        """Converts dates to day ordinals adjusted to the closest weekday.
+
+        Args:
+            dates (list[str] | np.ndarray): Date strings ('%Y-%m-%d') or integer day ordinals.
+
+        Returns:
+            np.ndarray: Adjusted day ordinals.
+        """
+        dates = np.asarray(dates)
+        if not np.issubdtype(dates.dtype, np.integer):
+            unique_dates, inverse = np.unique(dates, return_inverse=True)
+            ordinals = np.array([date_to_ordinal(str(date), self.date_format) for date in unique_dates], dtype=np.int64)
+            dates = ordinals[inverse.reshape(-1)]
+        dates = dates.astype(np.int64)
+        return np.asarray(self.calendar.closest_weekday(dates), dtype=np.int64).reshape(-1)
+
+    def cache_stats(self) -> dict:
+        """Returns the in-memory cache size and its hit / miss / eviction counters."""
+        stats = {"tickers": len(self.cache), "bytes": self.cache.nbytes}
+        stats.update(getattr(self.cache, "counters", {}))
+        stats["negative"] = dict(self.negative_cache.counters)
+        return stats
+
+    def build_matrix(self, path: str, tickers: list = None) -> PriceMatrix:
+        """Exports the cached price history to a shared, memory-mapped price matrix.
+
+        Worker processes can then open the matrix with `StockHistory(..., price_matrix=path)`
+        and share a single read-only copy of the price history.
+
+        Args:
+            path (str): Directory to write the matrix to.
+            tickers (list[str], optional): Tickers to export. Tickers that are not in memory are read from
+                the persistent cache or downloaded, once each and without adding them back to memory, so
+                `prefetch` them first to download them in batches. Defaults to None (the tickers in memory).
+
+        Returns:
+            PriceMatrix: The memory-mapped matrix.
+        """
+        if not tickers:
+            return PriceMatrix.build(store=self.cache, path=path)
+
+        valid = set()
+        for raw_ticker in set(ticker for ticker in tickers if ticker):
+            try:
+                valid.add(self.validate_ticker(ticker=raw_ticker))
+            except:
+                continue
+        return PriceMatrix.build(store=self.cache, path=path, tickers=sorted(valid), load=self.ticker_prices)
+
+    def ticker_prices(self, ticker: str):
+        """Returns the price history of a validated ticker without keeping an evicted ticker in memory.
+
+        Args:
+            ticker (str): The validated ticker symbol.
+
+        Returns:
+            TickerPrices: The price history from memory, the persistent cache or a download, or None if there is none.
+        """
+        if ticker in self.cache:
+            return self.cache[ticker]
+        cached = self.disk_cache.load(ticker) if self.disk_cache else None
+        if cached is not None:
+            return cached[0]
+        return self.load_history(ticker=ticker)
+
     def update_cache(self, ticker: str):
         try:
             ticker = self.validate_ticker(ticker=ticker)
         except:
             return None
 
-        ticker_history = self.stock_history(ticker=ticker)
-        if not ticker_history:
+        ticker_prices = self.load_history(ticker=ticker)
+        if ticker_prices is None:
             return 500
+        self.cache[ticker] = ticker_prices
+        self.clear_memo(ticker=ticker)
+        return 200
+
+    def load_history(self, ticker: str):
+        """Loads the price history of a validated ticker from the persistent cache and the provider.
+
+        Missing date ranges are downloaded and persisted, but the history is not added to
+        the in-memory cache.
+
+        Args:
+            ticker (str): The validated ticker symbol.
+
+        Returns:
+            TickerPrices: The price history, or None if there is none.
+        """
+        cached = self.disk_cache.load(ticker) if self.disk_cache else None
+        if cached is None and self.offline:
+            logger.warning(f"WARNING: No cached price history for '{ticker}' in offline mode.")
+            return None
+
+        downloads = []
+        for start, end in self.missing_ranges(cached=cached):
+            ticker_history = self.stock_history(
+                ticker=ticker,
+                start_date=datetime.fromordinal(start).strftime(self.date_format),
+                end_date=datetime.fromordinal(end).strftime(self.date_format),
+                flag_invalid=cached is None,
+            )
+            downloads.append((start, end, ticker_history))
+
+        if self.rebased(cached=cached, downloads=downloads):
+            start, end = self.refresh_range(cached=cached)
+            logger.info(f"Prices of '{ticker}' were adjusted since they were cached. Downloading the full history again.")
+            ticker_history = self.stock_history(
+                ticker=ticker,
+                start_date=datetime.fromordinal(start).strftime(self.date_format),
+                end_date=datetime.fromordinal(end).strftime(self.date_format),
+                flag_invalid=False,
+            )
+            cached, downloads = self.refreshed(cached=cached, downloads=[(start, end, ticker_history)])
+
+        return self.merge_history(ticker=ticker, cached=cached, downloads=downloads)
+
+    def missing_ranges(self, cached):
+        """Lists the date ranges that still have to be downloaded for a ticker.
+
+        Args:
+            cached (tuple): (TickerPrices, covered_start, covered_end) from the persistent cache, or None.
+
+        Returns:
+            list[tuple]: (start, end) day ordinal ranges, end exclusive.
+        """
+        if self.offline:
+            return []
+
+        requested_start = datetime.strptime(self.start_date, self.date_format).toordinal()
+        requested_end = datetime.strptime(self.end_date, self.date_format).toordinal()
+        if cached is None:
+            return [(requested_start, requested_end)]
+
+        # Only download the ranges that are missing from the persistent cache, plus a few
+        # cached days next to them so `rebased` can compare the price basis.
+        _, covered_start, covered_end = cached
+        missing = []
+        if requested_start < covered_start:
+            missing.append((requested_start, min(covered_start + REFRESH_OVERLAP_DAYS, covered_end)))
+        if covered_end < requested_end:
+            missing.append((max(covered_end - REFRESH_OVERLAP_DAYS, covered_start), requested_end))
+        return missing
+
+    def refresh_range(self, cached):
+        """Date range (day ordinals, end exclusive) covering both the request and the cached history."""
+        _, covered_start, covered_end = cached
+        requested_start = datetime.strptime(self.start_date, self.date_format).toordinal()
+        requested_end = datetime.strptime(self.end_date, self.date_format).toordinal()
+        return min(requested_start, covered_start), max(requested_end, covered_end)
+
+    def rebased(self, cached, downloads: list) -> bool:
+        """Checks whether downloaded prices disagree with the cached prices on shared sessions.
+
+        Providers such as yfinance return prices adjusted for the splits and dividends up
+        to the download date, so a corporate action since the history was cached moves
+        every earlier price. Merging a new range into the old one would then mix two price
+        bases, so the whole history has to be downloaded again instead.
+
+        Args:
+            cached (tuple): (TickerPrices, covered_start, covered_end) from the persistent cache, or None.
+            downloads (list[tuple]): (start, end, history dataframe) for each downloaded range.
+
+        Returns:
+            bool: True if any shared session has a different closing price.
+        """
+        if cached is None:
+            return False
+        ticker_prices = cached[0]
+        for _, _, ticker_history in downloads:
+            if ticker_history is None or ticker_history.empty:
+                continue
+            history = TickerPrices.from_frame(ticker_history)
+            _, cached_index, history_index = np.intersect1d(ticker_prices.sessions, history.sessions, assume_unique=True, return_indices=True)
+            if not np.allclose(ticker_prices.close[cached_index], history.close[history_index], rtol=1e-4, equal_nan=True):
+                return True
+        return False
 
-        ticker_data = {}
-        for record in ticker_history:
-            date = record["Date"]
-            ticker_data[date] = record
+    def refreshed(self, cached, downloads: list):
+        """Replaces a rebased cached history with a full download, if the download succeeded.
 
-        # Sort the ticker data by date
-        sorted_ticker_data = dict(sorted(ticker_data.items(), key=lambda item: datetime.strptime(item[0], self.date_format)))
+        Returns:
+            tuple: The (cached, downloads) to store. A failed download keeps serving the
+                cached history without the new ranges, so the price basis stays consistent.
+        """
+        if any(ticker_history is None or ticker_history.empty for _, _, ticker_history in downloads):
+            return cached, []
+        return None, downloads
 
-        self.cache[ticker] = sorted_ticker_data
+    def store_history(self, ticker: str, cached, downloads: list):
+        """Merges downloaded history into the cached history and stores the result in memory.
+
+        Args:
+            ticker (str): The validated ticker symbol.
+            cached (tuple): (TickerPrices, covered_start, covered_end) from the persistent cache, or None.
+            downloads (list[tuple]): (start, end, history dataframe) for each downloaded range.
+
+        Returns:
+            int: 200 if the ticker has price history, 500 otherwise.
+        """
+        ticker_prices = self.merge_history(ticker=ticker, cached=cached, downloads=downloads)
+        if ticker_prices is None:
+            return 500
+        self.cache[ticker] = ticker_prices
+        self.clear_memo(ticker=ticker)
         return 200
 
-    def stock_history(self, ticker: str, start_date: str = None, end_date: str = None):
+    def merge_history(self, ticker: str, cached, downloads: list):
+        """Merges downloaded history into the cached history and persists the result.
+
+        Args:
+            ticker (str): The validated ticker symbol.
+            cached (tuple): (TickerPrices, covered_start, covered_end) from the persistent cache, or None.
+            downloads (list[tuple]): (start, end, history dataframe) for each downloaded range.
+                A history of None marks a failed download, which does not extend the covered range.
+
+        Returns:
+            TickerPrices: The merged price history, or None if there is none.
+        """
+        if cached is None:
+            ticker_prices, covered_start, covered_end = None, None, None
+        else:
+            ticker_prices, covered_start, covered_end = cached
+
+        changed = False
+        downloaded = False
+        for start, end, ticker_history in downloads:
+            if ticker_history is None:
+                # Keep serving the cached range if the download failed.
+                continue
+            downloaded = True
+            if not ticker_history.empty:
+                history = TickerPrices.from_frame(ticker_history)
+                ticker_prices = history if ticker_prices is None else ticker_prices.merge(history)
+            if ticker_prices is None:
+                continue
+            covered_start = start if covered_start is None else min(covered_start, start)
+            covered_end = end if covered_end is None else max(covered_end, end)
+            changed = True
+
+        if ticker_prices is None:
+            if downloaded:
+                # The provider answered that the ticker has no history (e.g. delisted).
+                logger.warning(f"WARNING: No price history exists for '{ticker}'. Flagging as invalid ticker.")
+                self.negative_cache.add(ticker)
+            return None
+
+        if changed:
+            # Dates that had no nearby session may resolve within the new history.
+            self.negative_cache.discard_dates(ticker)
+            if self.disk_cache:
+                self.disk_cache.save(ticker, ticker_prices, covered_start, covered_end)
+        return ticker_prices
+
+    def prefetch(self, tickers: list, chunk_size: int = 50, max_workers: int = 4, retries: int = 3, backoff: float = 1.0, timeout: int = 30):
+        """Loads the price history of many tickers up front.
+
+        Tickers are de-duplicated, served from the persistent cache where possible, and
+        the remaining date ranges are downloaded in chunked multi-ticker batches on a
+        bounded thread pool instead of one ticker at a time.
+
+        Args:
+            tickers (list[str]): Tickers to load. Duplicates and empty values are ignored.
+            chunk_size (int, optional): Maximum number of tickers per download request. Defaults to 50.
+            max_workers (int, optional): Maximum number of concurrent download requests. Defaults to 4.
+            retries (int, optional): Number of retries for a failed request. Defaults to 3.
+            backoff (float, optional): Initial delay in seconds between retries, doubled per retry. Defaults to 1.0.
+            timeout (int, optional): Timeout in seconds for each download request. Defaults to 30.
+
+        Returns:
+            int: Number of tickers that have price history in the cache.
+        """
+        requested = set()
+        pending = {}
+        for raw_ticker in set(ticker for ticker in tickers if ticker):
+            try:
+                ticker = self.validate_ticker(ticker=raw_ticker)
+            except:
+                continue
+            requested.add(ticker)
+            if ticker in self.cache.keys() or ticker in pending:
+                continue
+            pending[ticker] = self.disk_cache.load(ticker) if self.disk_cache else None
+
+        # Group tickers by missing date range so each batch shares one request window.
+        requests = {}
+        for ticker, cached in pending.items():
+            for date_range in self.missing_ranges(cached=cached):
+                requests.setdefault(date_range, []).append(ticker)
+
+        downloads = {ticker: [] for ticker in pending}
+        downloads.update(self.download_ranges(requests=requests, chunk_size=chunk_size, max_workers=max_workers, retries=retries, backoff=backoff, timeout=timeout))
+
+        # Download the full history of tickers whose cached prices were adjusted since.
+        refresh = {}
+        for ticker, cached in pending.items():
+            if self.rebased(cached=cached, downloads=downloads[ticker]):
+                refresh.setdefault(self.refresh_range(cached=cached), []).append(ticker)
+        if refresh:
+            logger.info(f"Prices of {sum(len(group) for group in refresh.values())} tickers were adjusted since they were cached.")
+            refreshed = self.download_ranges(requests=refresh, chunk_size=chunk_size, max_workers=max_workers, retries=retries, backoff=backoff, timeout=timeout)
+            for group in refresh.values():
+                for ticker in group:
+                    pending[ticker], downloads[ticker] = self.refreshed(cached=pending[ticker], downloads=refreshed[ticker])
+
+        for ticker, cached in pending.items():
+            self.store_history(ticker=ticker, cached=cached, downloads=downloads[ticker])
+        return sum(1 for ticker in requested if ticker in self.cache.keys())
+
+    def download_ranges(self, requests: dict, chunk_size: int = 50, max_workers: int = 4, retries: int = 3, backoff: float = 1.0, timeout: int = 30) -> dict:
+        """Downloads date ranges of many tickers in chunked multi-ticker batches.
+
+        Args:
+            requests (dict): (start, end) day ordinal range to the tickers to download for it.
+
+        Returns:
+            dict: Ticker to a list of (start, end, history dataframe) downloads, with a
+                history of None for failed downloads (see `store_history`).
+        """
+        batches = []
+        for date_range, group in requests.items():
+            for i in range(0, len(group), chunk_size):
+                batches.append((date_range, group[i:i + chunk_size]))
+
+        downloads = {ticker: [] for group in requests.values() for ticker in group}
+        if batches:
+            logger.info(f"Downloading price history for {len(downloads)} tickers in {len(batches)} batches.")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(self.download_batch, batch, start, end, retries, backoff, timeout): ((start, end), batch)
+                    for (start, end), batch in batches
+                }
+                for future in as_completed(futures):
+                    (start, end), batch = futures[future]
+                    histories = future.result()
+                    if len(batch) > 1 and all(ticker_history.empty for ticker_history in histories.values()):
+                        # No ticker of the batch has prices, which points at a failed request (e.g. a
+                        # blocked client) rather than a batch of delisted tickers, so none is flagged.
+                        histories = {}
+                    for ticker in batch:
+                        # Tickers missing from the response failed to download, they do not mean "no history".
+                        ticker_history = histories.get(ticker)
+                        downloads[ticker].append((start, end, ticker_history))
+        return downloads
+
+    def download_batch(self, tickers: list, start: int, end: int, retries: int = 3, backoff: float = 1.0, timeout: int = 30) -> dict:
+        """Downloads the price history of several tickers in a single provider request.
+
+        Tickers that fail, either with the whole request or on their own, are retried
+        with an exponential backoff.
+
+        Args:
+            tickers (list[str]): Validated ticker symbols.
+            start (int): Day ordinal of the first date.
+            end (int): Day ordinal of the end date (exclusive).
+            retries (int, optional): Number of retries for failed tickers. Defaults to 3.
+            backoff (float, optional): Initial delay in seconds between retries, doubled per retry. Defaults to 1.0.
+            timeout (int, optional): Timeout in seconds for the request. Defaults to 30.
+
+        Returns:
+            dict: Ticker to history dataframe (empty if the ticker has no data). Tickers that still failed after the retries are left out.
+        """
+        start_date = datetime.fromordinal(start).strftime(self.date_format)
+        end_date = datetime.fromordinal(end).strftime(self.date_format)
+
+        histories = {}
+        remaining = list(tickers)
+        for attempt in range(retries + 1):
+            try:
+                histories.update(self.provider.download(tickers=remaining, start_date=start_date, end_date=end_date, timeout=timeout))
+                error = "no response for these tickers"
+            except Exception as e:
+                error = e
+            remaining = [ticker for ticker in remaining if ticker not in histories]
+            if not remaining:
+                break
+            if attempt == retries:
+                logger.error(f"ERROR: Failed to download {len(remaining)} of {len(tickers)} tickers between dates {start_date} and {end_date}: {error}")
+                break
+            time.sleep(backoff * 2 ** attempt)
+        return histories
+
+    def memoize(self, ticker: str, date_str: str, price):
+        if self.memo_entries >= MEMO_SIZE:
+            # Start over instead of tracking the age of every entry.
+            self.clear_memo()
+        self.price_memo.setdefault(ticker, {})[date_str] = price
+        self.memo_entries += 1
+
+    def clear_memo(self, ticker: str = None):
+        """Drops memoized price lookups for a ticker, or for every ticker if none is given."""
+        if ticker is None:
+            self.price_memo.clear()
+            self.memo_entries = 0
+            return
+        memo = self.price_memo.pop(ticker, None)
+        if memo:
+            self.memo_entries -= len(memo)
+
+    def stock_history(self, ticker: str, start_date: str = None, end_date: str = None, flag_invalid: bool = True):
         try:
             ticker = self.validate_ticker(ticker=ticker)
         except:
@@ -95,72 +566,67 @@ class StockHistory:
         if end_date is None:
             end_date = self.end_date
 
-        stock = yf.Ticker(ticker)
-
         try:
-            hist = stock.history(start=start_date, end=end_date)
-            hist = hist.reset_index()
-            hist["Date"] = hist["Date"].dt.strftime(self.date_format)
-            hist = hist.to_dict(orient="records")
+            hist = self.provider.history(ticker=ticker, start_date=start_date, end_date=end_date)
         except Exception as e:
+            if not flag_invalid:
+                logger.warning(f"WARNING: Failed to download '{ticker}' between dates {start_date} and {end_date}.")
+                return None
             logger.error(f"BAD TICKER: No data exists for '{ticker}' between dates {start_date} and {end_date}. Flagging as invalid ticker.")
-            self.invalid_tickers.append(ticker)
+            # The failure may be transient (e.g. rate limits), so only skip the ticker in this run.
+            self.negative_cache.add(ticker, persist=False)
             return None
         return hist
 
     def closest_weekday(self, date_str=None):
         if date_str:
-            date_obj = datetime.strptime(date_str, self.date_format).date()
+            ordinal = date_to_ordinal(date_str, self.date_format)
         else:
-            date_obj = datetime.now().date()
+            ordinal = datetime.now().toordinal()
 
-        weekday = date_obj.weekday()
-
-        if weekday == 5:
-            adjusted_date = date_obj - timedelta(days=1)
-        elif weekday == 6:
-            adjusted_date = date_obj - timedelta(days=2)
-        else:
-            adjusted_date = date_obj
-
-        if adjusted_date in self.holidays:
-            weekday = adjusted_date.weekday()
-            if weekday == 0:
-                adjusted_date = adjusted_date + timedelta(days=-3)
-            else:
-                adjusted_date = adjusted_date + timedelta(days=-1)
-
-        return adjusted_date.strftime(self.date_format)
+        adjusted = int(self.calendar.closest_weekday(ordinal))
+        return ordinal_to_date(adjusted, self.date_format)
 
     def validate_ticker(self, ticker: str):
         ticker = ticker.upper()
-        if ticker in self.invalid_tickers:
-            raise Exception(f"The ticker '{ticker}' is not publicly listed.")
-
         if ticker in self.ticker_map.keys():
             ticker = self.ticker_map[ticker]
+
+        if ticker in self.negative_cache:
+            raise Exception(f"The ticker '{ticker}' is not publicly listed.")
         return ticker
         
 
-    def find_nearest_date(self, date_keys, target_date):
-        date_list = [datetime.strptime(date, self.date_format) for date in date_keys]
-        pos = bisect_left(date_list, target_date)
-        
-        two_weeks = timedelta(weeks=2)
-        
+    def find_nearest_date(self, sessions, target_ordinal):
+        """Finds the index of the session closest to the target date.
+
+        Args:
+            sessions (np.ndarray): Sorted session day ordinals for a ticker.
+            target_ordinal (int): Day ordinal of the requested date.
+
+        Returns:
+            int: Index of the nearest session, or None if it is more than two weeks away.
+        """
+        if len(sessions) == 0:
+            return None
+
+        pos = int(np.searchsorted(sessions, target_ordinal, side="left"))
+
         if pos == 0:
-            nearest_date = date_list[0]
-        elif pos == len(date_list):
-            nearest_date = date_list[-1]
+            nearest = 0
+        elif pos == len(sessions):
+            nearest = pos - 1
+        elif sessions[pos] == target_ordinal:
+            nearest = pos
         else:
-            before = date_list[pos - 1]
-            after = date_list[pos]
-            if after - target_date < target_date - before:
-                nearest_date = after
+            before = int(sessions[pos - 1])
+            after = int(sessions[pos])
+            if after - target_ordinal < target_ordinal - before:
+                nearest = pos
             else:
-                nearest_date = before
-        
-        if abs(nearest_date - target_date) <= two_weeks:
-            return nearest_date
+                nearest = pos - 1
+
+        if abs(int(sessions[nearest]) - target_ordinal) <= 14:
+            return nearest
         else:
             return None
@@ -0,0 +1,122 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from .disclosure_table import DisclosureTable, horizon_gains
+from .tradertrack import DEFAULT_HORIZON, calculate_significance, horizon_suffix
+
+SIDES = {"purchase": 1, "sale": -1}
+
+
+class TraderScoreIndex:
+    """As-of index of each congress member's realized trade gains.
+
+    A member's score at a cutoff date only depends on the gains of their trades up to
+    that date, so the gains are computed once, sorted by transaction date per member and
+    stored with prefix sums. The purchase and sale scores `TraderTracker` would compute
+    from the disclosures up to any cutoff are then answered with a binary search.
+
+    For each horizon and side the gains of all members are stored back to back: member
+    `m` owns positions `offsets[m]:offsets[m + 1]` of the `ordinals` and `prefix` arrays.
+    """
+    def __init__(self, members: list, first_trades: np.ndarray, sides: dict, horizons: tuple, today: int):
+        self.members = members
+        self.member_ids = {member: i for i, member in enumerate(members)}
+        self.first_trades = first_trades
+        self.sides = sides
+        self.horizons = horizons
+        self.today = today
+
+    @classmethod
+    def build(cls, disclosures: list[dict], stock_history, horizons=(DEFAULT_HORIZON,), today: int = None):
+        """Computes the gains of every disclosure and indexes them by member and date.
+
+        Args:
+            disclosures (list[dict]): List of disclosure records
+            stock_history (StockHistory): Price history used to evaluate the trades.
+            horizons (tuple[int], optional): Horizons in days to score trades over. The 360 day horizon is always scored. Defaults to (360,).
+            today (int, optional): Day ordinal of today. Defaults to None (the current date).
+
+        Returns:
+            TraderScoreIndex: The index.
+        """
+        if today is None:
+            today = datetime.now().toordinal()
+        horizons = tuple(sorted(set(horizons) | {DEFAULT_HORIZON}))
+        stock_history.prefetch(tickers=[disclosure['ticker'] for disclosure in disclosures])
+        table = DisclosureTable.from_records(disclosures)
+        all_gains, gain_sides = horizon_gains(table=table, stock_history=stock_history, horizons=horizons, today=today)
+
+        member_ids = table["member_id"]
+        ordinals = table["transaction_ordinal"]
+        first_trades = np.full(len(table.members), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_trades, member_ids, ordinals)
+
+        # Stable sort by member, then date, so same-day trades keep their disclosure order.
+        order = np.lexsort((ordinals, member_ids))
+        sides = {}
+        for horizon, gains in all_gains.items():
+            sides[horizon] = {}
+            for side, value in SIDES.items():
+                rows = order[(gain_sides[order] == value) & ~np.isnan(gains[order])]
+                side_members = member_ids[rows]
+                side_gains = gains[rows]
+                offsets = np.searchsorted(side_members, np.arange(len(table.members) + 1)).astype(np.int64)
+                prefix = np.empty(len(rows), dtype=np.float64)
+                for m in range(len(table.members)):
+                    prefix[offsets[m]:offsets[m + 1]] = np.cumsum(side_gains[offsets[m]:offsets[m + 1]])
+                sides[horizon][side] = {"offsets": offsets, "ordinals": ordinals[rows], "prefix": prefix}
+
+        return cls(members=table.members, first_trades=first_trades, sides=sides, horizons=horizons, today=today)
+
+    def side_score(self, horizon: int, side: str, member_id: int, cutoff: int) -> float:
+        index = self.sides[horizon][side]
+        start, end = index["offsets"][member_id], index["offsets"][member_id + 1]
+        count = int(np.searchsorted(index["ordinals"][start:end], cutoff, side="right"))
+        if count == 0:
+            return 0
+        average = float(index["prefix"][start + count - 1]) / count
+        # Only the number of samples matters for the significance.
+        return average * calculate_significance(samples=range(count))
+
+    def trader_performance(self, name: str, cutoff: int):
+        """Returns a member's purchase and sale scores using their trades up to a cutoff date.
+
+        Args:
+            name (str): Full name of the congress member.
+            cutoff (int): Day ordinal of the last transaction date to include.
+
+        Returns:
+            dict: The 'purchase' and 'sale' scores (plus e.g. 'purchase_90d' for additional horizons), or None if the member had no trades by the cutoff.
+        """
+        member_id = self.member_ids.get(name)
+        if member_id is None or self.first_trades[member_id] > cutoff:
+            return None
+
+        performance = {}
+        for horizon in self.horizons:
+            for side in SIDES:
+                performance[f"{side}{horizon_suffix(horizon)}"] = self.side_score(horizon, side, member_id, cutoff)
+        return performance
+
+    def save(self, path: str):
+        arrays = {"first_trades": self.first_trades}
+        for horizon, horizon_sides in self.sides.items():
+            for side, index in horizon_sides.items():
+                for key, values in index.items():
+                    arrays[f"{horizon}_{side}_{key}"] = values
+        metadata = {"members": self.members, "horizons": list(self.horizons), "today": self.today}
+        np.savez(path, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            horizons = tuple(metadata["horizons"])
+            sides = {
+                horizon: {side: {key: data[f"{horizon}_{side}_{key}"] for key in ("offsets", "ordinals", "prefix")} for side in SIDES}
+                for horizon in horizons
+            }
+            first_trades = data["first_trades"]
+        return cls(members=metadata["members"], first_trades=first_trades, sides=sides, horizons=horizons, today=metadata["today"])
@@ -1,7 +1,14 @@
 from .stockmarket import StockHistory
-from .date_tools import days_from_date, days_ago
-from datetime import datetime, timedelta
-from tqdm.auto import tqdm
+from .price_store import PriceMatrix
+from .prefetcher import BackgroundPrefetch
+from .date_tools import days_ago_ordinal, days_from_ordinal, ordinal_to_date, transaction_ordinal
+from .disclosure_table import DisclosureTable, horizon_gains
+from datetime import datetime, timedelta, date
+from concurrent.futures import ProcessPoolExecutor
+import os
+import tempfile
+import numpy as np
+from IPython import get_ipython
 from IPython.display import clear_output
 
 def calculate_significance(samples: list) -> float:
@@ -11,6 +18,50 @@ def calculate_significance(samples: list) -> float:
     return significance
 
 
+# Horizon (in days) of the main purchase / sale scores.
+DEFAULT_HORIZON = 360
+
+
+def horizon_suffix(horizon: int) -> str:
+    """Suffix of the score and confidence keys of a horizon ('' for the default horizon, e.g. '_90d' otherwise)."""
+    return "" if horizon == DEFAULT_HORIZON else f"_{horizon}d"
+
+
+def gains_score(gains: list) -> float:
+    """Average gains weighted by their significance (0 if there are no gains)."""
+    if not gains:
+        return 0
+    return (sum(gains) / len(gains)) * calculate_significance(samples=gains)
+
+
+def full_name(disclosure: dict) -> str:
+    return f"{disclosure['first_name']} {disclosure['last_name']}"
+
+
+def group_by_member(disclosures: list[dict]) -> dict:
+    """Groups disclosures by congress member in a single pass.
+
+    Args:
+        disclosures (list[dict]): List of disclosure records
+
+    Returns:
+        dict: Member full name to that member's disclosures, in order of first appearance.
+    """
+    groups = {}
+    for disclosure in disclosures:
+        name = full_name(disclosure)
+        if name not in groups:
+            groups[name] = []
+        groups[name].append(disclosure)
+    return groups
+
+
+def in_notebook() -> bool:
+    """Returns True when running inside a Jupyter kernel."""
+    shell = get_ipython()
+    return shell is not None and shell.__class__.__name__ == "ZMQInteractiveShell"
+
+
 class Trader:
     def __init__(self, name: str):
         self.name = name
@@ -18,22 +69,100 @@ class Trader:
         self.sale_gains_1yr = []
         self.purchase_score = 0
         self.sale_score = 0
+        # Scores of any additional horizons, keyed like 'purchase_90d' / 'sale_90d'.
+        self.horizon_scores = {}
+
+
+def evaluate_traders(groups: dict, stock_history: StockHistory, horizons=(DEFAULT_HORIZON,), today: int = None, verbose: bool = False, prefetch: BackgroundPrefetch = None) -> dict:
+    """Scores the trading performance of each congress member.
+
+    Args:
+        groups (dict): Member full name to that member's disclosures (see `group_by_member`).
+        stock_history (StockHistory): Price history to evaluate trades with.
+        horizons (tuple[int], optional): Horizons in days to score trades over. Must include 360. Defaults to (360,).
+        today (int, optional): Day ordinal of today. Defaults to None (the current date).
+        verbose (bool, optional): Show per-member progress. Defaults to False.
+        prefetch (BackgroundPrefetch, optional): Price download to wait for before the first price lookup. Defaults to None.
+
+    Returns:
+        dict: Member full name to Trader, in the order of `groups`.
+    """
+    traders = {trader: Trader(name=trader) for trader in groups.keys()}
+    congress_members = list(traders.keys())
+
+    # Compute the forward gains of all members' disclosures for every horizon in one vectorized pass.
+    ordered = [disclosure for trader in congress_members for disclosure in groups[trader]]
+    table = DisclosureTable.from_records(ordered)
+    if prefetch is not None:
+        # Prices are only needed from here on.
+        prefetch.wait()
+    all_gains, sides = horizon_gains(table=table, stock_history=stock_history, horizons=horizons, today=today)
+    if verbose:
+        year = date.fromordinal(int(table["transaction_ordinal"].max())).year
+
+    offset = 0
+    for i,trader in enumerate(congress_members):
+        count = len(groups[trader])
+        side = sides[offset:offset + count]
+        if verbose:
+            print(f"\n{year} Trader ({i+1}/{len(congress_members)}): {trader}")
+
+        for horizon in horizons:
+            gains = all_gains[horizon][offset:offset + count]
+            valid = ~np.isnan(gains)
+            purchases = gains[valid & (side == 1)].tolist()
+            sales = gains[valid & (side == -1)].tolist()
+            if horizon == DEFAULT_HORIZON:
+                traders[trader].purchase_gains_1yr.extend(purchases)
+                traders[trader].sale_gains_1yr.extend(sales)
+                traders[trader].purchase_score = gains_score(traders[trader].purchase_gains_1yr)
+                traders[trader].sale_score = gains_score(traders[trader].sale_gains_1yr)
+            else:
+                suffix = horizon_suffix(horizon)
+                traders[trader].horizon_scores[f"purchase{suffix}"] = gains_score(purchases)
+                traders[trader].horizon_scores[f"sale{suffix}"] = gains_score(sales)
+        offset += count
+
+        if verbose:
+            clear_output()
+    return traders
+
+
+def evaluate_shard(groups: dict, price_matrix: str, horizons: tuple, today: int) -> dict:
+    """Process pool entry point of `evaluate_traders` reading prices from a shared PriceMatrix."""
+    stock_history = StockHistory(start_date="2012-01-01", price_matrix=price_matrix)
+    return evaluate_traders(groups=groups, stock_history=stock_history, horizons=horizons, today=today)
 
 
 class TraderTracker:
-    def __init__(self, disclosures, stock_history=None):
+    def __init__(self, disclosures, stock_history=None, groups: dict=None, verbose: bool=None, horizons=(DEFAULT_HORIZON,), workers: int=1, prefetch: BackgroundPrefetch=None):
+        """Tracks the trading performance of each congress member.
+
+        Args:
+            disclosures (list[dict]): List of disclosure records
+            stock_history (StockHistory, optional): Price history to evaluate trades with. Defaults to None.
+            groups (dict, optional): Pre-built `group_by_member` index of the disclosures. Defaults to None.
+            verbose (bool, optional): Show per-member progress. Defaults to None (only inside Jupyter).
+            horizons (tuple[int], optional): Horizons in days to score trades over. The 360 day horizon is always scored. Defaults to (360,).
+            workers (int, optional): Number of processes to evaluate members on. Defaults to 1 (in process).
+            prefetch (BackgroundPrefetch, optional): Price download already running for the disclosures. Defaults to None (one is started).
+        """
         self.disclosures = disclosures
         if stock_history:
             self.stock_history = stock_history
         else:
             self.stock_history = StockHistory(start_date="2012-01-01", end_date=datetime.now().date().strftime("%Y-%m-%d"))
+        self.groups = groups if groups is not None else group_by_member(disclosures)
+        self.verbose = in_notebook() if verbose is None else verbose
+        self.horizons = tuple(sorted(set(horizons) | {DEFAULT_HORIZON}))
+        self.workers = workers
+        self.prefetch = prefetch
         self.tracker = {}
         self.initialize_tracker()
         self.calculate_performance_history()
 
     def initialize_tracker(self):
-        traders = [self.full_name(disclosure) for disclosure in self.disclosures]
-        for trader in traders:
+        for trader in self.groups.keys():
             self.tracker[trader] = Trader(name=trader)
 
     def trader_performance(self, name: str):
@@ -48,64 +177,57 @@ class TraderTracker:
             "purchase": purchase,
             "sale": sale
         }
+        performance.update(self.tracker[name].horizon_scores)
         return performance
 
     def calculate_performance_history(self):
-        dates = [datetime.strptime(disclosure['transaction_date'], '%Y-%m-%d') for disclosure in self.disclosures]
-        year = max(dates).year
-        congress_members = list(self.tracker.keys())
-        for i,trader in enumerate(congress_members):
-            trader_disclosures = [disclosure for disclosure in self.disclosures if self.full_name(disclosure) == trader]
-            print(f"\n{year} Trader ({i+1}/{len(congress_members)}): {trader}")
-            for disclosure in tqdm(trader_disclosures):
-                future_price = self.get_future_gains(disclosure=disclosure)
-                gains = future_price['gains']
-                if not gains:
-                    continue
-
-                if disclosure['transaction'] == 'purchase' and disclosure['asset_code'] == 'ST':
-                    self.tracker[trader].purchase_gains_1yr.append(gains)
-                elif disclosure['transaction'] == 'sale' and disclosure['asset_code'] == 'ST':
-                    gains = 1 - gains
-                    self.tracker[trader].sale_gains_1yr.append(gains)
-                elif disclosure['transaction'] == 'purchase' and disclosure['asset_code'] == 'OP':
-                    if disclosure['option_type'] == 'put':
-                        gains = 1 - gains
-                        self.tracker[trader].sale_gains_1yr.append(gains)
-                    elif disclosure['option_type'] == 'call':
-                        self.tracker[trader].purchase_gains_1yr.append(gains)
-                elif disclosure['transaction'] == 'sale' and disclosure['asset_code'] == 'OP':
-                    if disclosure['option_type'] == 'put':
-                        self.tracker[trader].purchase_gains_1yr.append(gains)
-                    elif disclosure['option_type'] == 'call':
-                        gains = 1 - gains
-                        self.tracker[trader].sale_gains_1yr.append(gains)
-
-            purchases = self.tracker[trader].purchase_gains_1yr
-            sales = self.tracker[trader].sale_gains_1yr
-            if purchases:
-                purchase_score = sum(purchases) / len(purchases)
-                significance = calculate_significance(samples=purchases)
-                self.tracker[trader].purchase_score = purchase_score * significance
-            else:
-                self.tracker[trader].purchase_score = 0
-            if sales:
-                sale_score = sum(sales) / len(sales)
-                significance = calculate_significance(samples=sales)
-                self.tracker[trader].sale_score = sale_score * significance
+        # Download the price history of every traded ticker while the disclosures are tabulated.
+        prefetch = self.prefetch
+        if prefetch is None:
+            prefetch = BackgroundPrefetch(stock_history=self.stock_history, tickers=[disclosure['ticker'] for disclosure in self.disclosures])
+        # Every shard measures gains against the same day.
+        today = datetime.now().toordinal()
+        if self.workers > 1 and len(self.tracker) > 1:
+            prefetch.wait()
+            traders = self.evaluate_parallel(today=today)
+        else:
+            traders = evaluate_traders(groups=self.groups, stock_history=self.stock_history, horizons=self.horizons, today=today, verbose=self.verbose, prefetch=prefetch)
+        for trader in self.tracker.keys():
+            self.tracker[trader] = traders[trader]
+
+    def evaluate_parallel(self, today: int) -> dict:
+        """Evaluates the members in shards on a process pool.
+
+        The workers open a read-only, memory-mapped copy of the price history instead of
+        receiving a pickled cache. Each member is evaluated independently, so the merged
+        results do not depend on the number of workers.
+        """
+        members = list(self.tracker.keys())
+        shards = [members[i::self.workers] for i in range(self.workers) if members[i::self.workers]]
+        traders = {}
+        with tempfile.TemporaryDirectory(prefix="price-matrix-") as directory:
+            if isinstance(self.stock_history.cache, PriceMatrix):
+                matrix_path = self.stock_history.cache.path
             else:
-                self.tracker[trader].sale_score = 0
+                matrix_path = os.path.join(directory, "prices")
+                # Export every traded ticker, including any evicted under a memory budget.
+                self.stock_history.build_matrix(path=matrix_path, tickers=[disclosure['ticker'] for disclosure in self.disclosures])
 
-            clear_output()
+            with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+                futures = [
+                    executor.submit(evaluate_shard, {trader: self.groups[trader] for trader in shard}, matrix_path, self.horizons, today)
+                    for shard in shards
+                ]
+                for future in futures:
+                    traders.update(future.result())
+        return traders
 
     def full_name(self, disclosure):
-        first_name = disclosure['first_name']
-        last_name = disclosure['last_name']
-        full_name = f"{first_name} {last_name}"
-        return full_name
+        return full_name(disclosure)
 
     def get_future_gains(self, disclosure, days_in_future=360):
-        num_days_ago = days_ago(date_str=disclosure['transaction_date'], date_format='%Y-%m-%d')
+        ordinal = transaction_ordinal(disclosure)
+        num_days_ago = days_ago_ordinal(ordinal)
         if num_days_ago < days_in_future:
             return {
                 "gains": None,
@@ -113,7 +235,7 @@ class TraderTracker:
                 "future_price": None
             }
 
-        future_date = days_from_date(date_str=disclosure['transaction_date'], days=days_in_future)
+        future_date = ordinal_to_date(days_from_ordinal(ordinal, days_in_future))
         future_price = self.stock_history.price(ticker=disclosure['ticker'], date_str=future_date)
 
         if future_price is None:
@@ -1,5 +1,7 @@
 import json
 
+from .date_tools import add_date_ordinals
+
 
 def load_json(path: str) -> dict:
     """Tool for loading json data from a file to dictionary.
@@ -17,6 +19,24 @@ def load_json(path: str) -> dict:
     return data
 
 
+def load_disclosures(paths: list[str]) -> list[dict]:
+    """Loads and combines parsed disclosure records from json files.
+
+    The transaction, notification and option expiration dates are parsed once here
+    and stored on each record as integer day ordinals.
+
+    Args:
+        paths (list[str]): Paths to parsed disclosure json files (e.g. senate.json, house.json).
+
+    Returns:
+        list[dict]: The combined disclosure records.
+    """
+    disclosures = []
+    for path in paths:
+        disclosures.extend(load_json(path=path)["disclosures"])
+    return add_date_ordinals(disclosures)
+
+
 def write_json(data: dict, path:str) -> None:
     """Writes dictionary data to a json file with proper formatting.
 